@@ -0,0 +1,124 @@
+"""
+Closed-form section properties and critical stresses for the stiffened box.
+
+The box built by section_funcs.boxsection is a set of non-overlapping
+rectangles, so area, centroid and second moments of area are exact sums.
+Torsion uses Bredt's single-cell formula and vertical shear the thin-wall
+shear flow at the neutral axis. Critical stresses take the extreme of the
+linear bending field over the parts of each critical box that contain steel.
+
+Used to screen large design spaces in microseconds before running the
+finite element analysis on the shortlisted designs (engine.check_design(method='analytic')).
+"""
+import numpy as np
+
+import section_funcs
+
+def box_rectangles(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web=None):
+    """
+    Plates of the stiffened box as an (n_plates, 4) array of [x0, y0, x1, y1],
+    with the same layout as section_funcs.boxsection
+    """
+    return section_funcs.box_plates(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web)
+
+def section_properties(rects,b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web=None):
+    """
+    Area, centroid, centroidal second moments of area and torsion constant,
+    as a dict with the keys of section_funcs.SectionData.props
+    """
+    x0, y0, x1, y1 = rects.T
+    w, h = x1 - x0, y1 - y0
+    areas = w * h
+    area = areas.sum()
+    cx = (areas * (x0 + x1) / 2).sum() / area
+    cy = (areas * (y0 + y1) / 2).sum() / area
+    ixx_c = (w * h**3 / 12 + areas * ((y0 + y1) / 2 - cy)**2).sum()
+    iyy_c = (h * w**3 / 12 + areas * ((x0 + x1) / 2 - cx)**2).sum()
+    ixy_c = (areas * ((x0 + x1) / 2 - cx) * ((y0 + y1) / 2 - cy)).sum()
+
+    #Bredt closed cell on the plate mid-lines plus the open stiffeners
+    A_m = (b - t_w) * (d - t_f)
+    j = 4 * A_m**2 / (2 * (b - t_w) / t_f + 2 * (d - t_f) / t_w)
+    j += (len(rects) - 4) * d_stif * t_stif**3 / 3
+    return {'area': area, 'cx': cx, 'cy': cy, 'ixx_c': ixx_c, 'iyy_c': iyy_c, 'ixy_c': ixy_c, 'j': j}
+
+def bending_stress(props,Mz,My,x,y):
+    """Bending stress sig_zz_m at (x, y), using the sectionproperties sign convention (Mxx = Mz, Myy = My)"""
+    dx, dy = x - props['cx'], y - props['cy']
+    ixx, iyy, ixy = props['ixx_c'], props['iyy_c'], props['ixy_c']
+    det = ixx * iyy - ixy**2
+    return (-ixy * Mz * dx + iyy * Mz * dy) / det + (-ixx * My * dx + ixy * My * dy) / det
+
+def box_stress(rects,props,box,Mz,My):
+    """
+    Equivalent of section_funcs.stress_location for the linear bending field:
+    the extreme (or area-weighted mean) over the steel inside the box
+    """
+    x_c, y_c, tol_x, tol_y, result_type = box
+    x0 = np.maximum(rects[:,0], x_c - tol_x)
+    y0 = np.maximum(rects[:,1], y_c - tol_y)
+    x1 = np.minimum(rects[:,2], x_c + tol_x)
+    y1 = np.minimum(rects[:,3], y_c + tol_y)
+    inside = (x0 <= x1) & (y0 <= y1)
+    if not inside.any():
+        raise ValueError("No steel within region {0}".format(box[:4]))
+    x0, y0, x1, y1 = x0[inside], y0[inside], x1[inside], y1[inside]
+    if result_type == "mean":
+        areas = (x1 - x0) * (y1 - y0)
+        return abs((areas * bending_stress(props,Mz,My,(x0 + x1) / 2,(y0 + y1) / 2)).sum() / areas.sum())
+    corners = bending_stress(props,Mz,My,np.concatenate([x0, x0, x1, x1]),np.concatenate([y0, y1, y0, y1]))
+    if result_type == "max":
+        return abs(corners.max())
+    elif result_type == "min":
+        return abs(corners.min())
+
+def critical_stresses(rects,props,boxes,loads,b,d,t_w,t_f):
+    """
+    Analytic equivalent of engine.critical_stresses.
+    boxes: output of engine.critical_boxes, loads: load record
+    """
+    Mz, My = loads['Mz'], loads['My']
+    x0, y0, x1, y1 = rects.T
+    corners = bending_stress(props,Mz,My,np.concatenate([x0, x0, x1, x1]),np.concatenate([y0, y1, y0, y1]))
+    crit = {
+        'f_star_s_comp': corners.max(),
+        'f_star_s_tens': corners.min(),
+    }
+    for name, box in boxes.items():
+        crit[name] = box_stress(rects,props,box,Mz,My)
+
+    #Vertical shear: thin-wall shear flow at the neutral axis, shared by both webs
+    cy = props['cy']
+    above = np.clip(y1 - np.maximum(y0, cy), 0, None)
+    Q = ((x1 - x0) * above * ((y1 + np.maximum(y0, cy)) / 2 - cy)).sum()
+    crit['f_star_v'] = abs(loads['Fy']) * Q / (props['ixx_c'] * 2 * t_w)
+
+    #Torsion: Bredt shear flow in the thinnest wall of the cell
+    A_m = (b - t_w) * (d - t_f)
+    crit['f_star_vt'] = abs(loads['Mx']) / (2 * A_m * min(t_w, t_f))
+    return crit
+
+def cross_check(designs,loads=None,sample=10,seed=0,keys=('area', 'ixx_c', 'iyy_c', 'j', 'f_star_s_fl',
+                'f_star_s_fl_mid', 'f_star_v', 'f_star_vt', 'util_flange_yield')):
+    """
+    Compare the analytic and finite element results on a random sample of designs.
+    Returns a list of dicts with the design and the relative difference
+    (analytic / FE - 1) of each key (0 where both are zero).
+    """
+    import random
+    import engine
+
+    rng = random.Random(seed)
+    chosen = rng.sample(list(designs), min(sample, len(designs)))
+    rows = []
+    for design in chosen:
+        fe = engine.check_design(design,loads or {})
+        fast = engine.check_design(design,loads or {},method='analytic')
+        rows.append({'design': design, **{key: _relative(fast[key], fe[key]) for key in keys}})
+    return rows
+
+def _relative(value, reference):
+    """value / reference - 1, with 0 if both are zero and inf if only the reference is"""
+    if reference == 0:
+        return 0.0 if value == 0 else float('inf')
+    return value / reference - 1
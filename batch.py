@@ -0,0 +1,141 @@
+"""
+Command line batch runner for the box girder design checks.
+
+Reads design and load rows from a CSV or Parquet file, runs the full check
+chain on each and streams the result rows to a CSV file chunk by chunk, so
+memory use does not grow with the size of the input. Progress is
+checkpointed after every chunk and an interrupted job resumes where it
+stopped when run again with the same arguments.
+
+Input columns are the keys of engine.DESIGN_DEFAULTS and engine.LOAD_DEFAULTS
+in SI units (m, Pa, N, Nm); missing columns take the defaults.
+
+    python batch.py designs.csv results.csv --chunk-size 1000 --processes 8
+"""
+import argparse
+import json
+import os
+import shutil
+
+import pandas as pd
+
+import engine
+import results_store
+import section_cache
+
+#Result fields written for each row
+RESULT_COLUMNS = ('area', 'f_star_s_comp', 'f_star_s_tens', 'f_star_s_fl', 'f_star_s_web',
+                  'f_star_s_fl_mid', 'f_star_s_web_mid', 'f_star_s_fl_mean', 'f_star_v', 'f_star_vt',
+                  'f_star_comb', 'util_flange_yield', 'flange_yield_pass', 'K_c', 'lamda_kc_a', 'lamda_kc_b', 'error')
+
+def read_chunks(path, chunk_size, skip=0):
+    """Yield DataFrames of up to chunk_size input rows, after skipping the first skip rows"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        rows = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            if rows + len(chunk) > skip:
+                yield chunk.iloc[max(skip - rows, 0):]
+            rows += len(chunk)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, skip + 1))
+
+def parse_row(row):
+    """(design, loads) of one input row, a dict of columns (other columns are ignored)"""
+    design = {key: row[key] for key in engine.DESIGN_DEFAULTS if key in row}
+    design['n_stif'] = int(design.get('n_stif', engine.DESIGN_DEFAULTS['n_stif']))
+    if pd.isna(design.get('n_stif_web')):
+        design.pop('n_stif_web', None) #blank: same as the flange
+    else:
+        design['n_stif_web'] = int(design['n_stif_web'])
+    loads = {key: row[key] for key in engine.LOAD_DEFAULTS if key in row}
+    return design, loads
+
+def run_chunk(design_engine, chunk, processes=None, method='fe'):
+    """Check every row of a chunk and return the input rows joined with the results"""
+    records = [parse_row(row) for row in chunk.to_dict('records')]
+    results = design_engine.run_batch(records, processes, method, errors=True)
+    results = pd.DataFrame(results, columns=RESULT_COLUMNS, index=chunk.index)
+    return pd.concat([chunk, results], axis=1)
+
+def _input_stamp(path):
+    """Path, size and modification time of an input file, tying a checkpoint to its content"""
+    stat = os.stat(path)
+    return {'input': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+def _read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_checkpoint(path, checkpoint):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+def run(input_path, output_path, chunk_size=1000, processes=None, method='fe', cache_dir=None, restart=False, progress=print,
+        store_path=None):
+    """
+    Run the checks on every row of input_path, appending results to output_path.
+    Resumes from output_path + '.checkpoint' unless restart is True, or the input
+    file has changed since the checkpoint (then the output is started again).
+    cache_dir: section cache directory; by default sections are cached in
+    output_path + '.sections' so later chunks and resumed runs reuse them,
+    and that directory is removed once every row is done
+    store_path: optional results_store database; rows it holds are not re-evaluated
+    Returns the number of rows processed in total.
+    """
+    checkpoint_path = output_path + '.checkpoint'
+    checkpoint = None if restart else _read_checkpoint(checkpoint_path)
+    stamp = _input_stamp(input_path)
+    if checkpoint is not None and any(checkpoint.get(key) != value for key, value in stamp.items()):
+        if checkpoint.get('input') == stamp['input'] and checkpoint.get('rows'):
+            progress(f"{input_path} has changed since the checkpoint, starting again")
+        checkpoint = None
+    if checkpoint is None:
+        checkpoint = {**stamp, 'rows': 0, 'bytes': 0}
+    elif checkpoint['rows']:
+        progress(f"Resuming after {checkpoint['rows']} rows")
+
+    #Drop any rows written after the last checkpoint
+    with open(output_path, 'ab') as f:
+        f.truncate(checkpoint['bytes'])
+
+    default_cache = cache_dir is None
+    cache_dir = cache_dir or output_path + '.sections'
+    design_engine = engine.DesignEngine(cache=section_cache.SectionCache(cache_dir) if method == 'fe' else None,
+                                        store=results_store.ResultsStore(store_path) if store_path else None)
+    for chunk in read_chunks(input_path, chunk_size, checkpoint['rows']):
+        results = run_chunk(design_engine, chunk, processes, method)
+        with open(output_path, 'a', newline='') as f:
+            results.to_csv(f, header=checkpoint['bytes'] == 0, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+            checkpoint['bytes'] = f.tell()
+        checkpoint['rows'] += len(chunk)
+        _write_checkpoint(checkpoint_path, checkpoint)
+        progress(f"{checkpoint['rows']} rows done")
+    if default_cache:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return checkpoint['rows']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the box girder design checks on a table of designs and loads")
+    parser.add_argument('input', help="CSV or Parquet file of design and load rows")
+    parser.add_argument('output', help="CSV file the result rows are appended to")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="rows per chunk (default 1000)")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default one per core)")
+    parser.add_argument('--method', choices=('fe', 'analytic'), default='fe', help="section analysis method")
+    parser.add_argument('--cache-dir', default=None, help="directory of the persistent section cache (default: a temporary one next to the output)")
+    parser.add_argument('--store', default=None, help="SQLite results store to reuse and record results in")
+    parser.add_argument('--restart', action='store_true', help="ignore any checkpoint and start again")
+    args = parser.parse_args(argv)
+    run(args.input, args.output, args.chunk_size, args.processes, args.method, args.cache_dir, args.restart,
+        store_path=args.store)
+
+if __name__ == '__main__':
+    main()
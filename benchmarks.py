@@ -0,0 +1,211 @@
+"""
+Benchmarks of the box girder calculation code.
+
+Stages: each calculation stage is timed on a fixed grid of designs over
+n_stif, box size and mesh density, and the results written to JSON. Two
+result files are compared stage by stage and slowdowns beyond a threshold
+flagged:
+
+    python benchmarks.py run bench.json
+    python benchmarks.py compare baseline.json bench.json --threshold 0.1
+
+Import time: each headless module is imported in a fresh interpreter and must
+load within a time budget without pulling in the UI and plotting packages,
+which are only imported on first use:
+
+    python benchmarks.py imports --budget 0.5
+
+compare lists baseline stages missing from the new results (e.g. after a --quick
+run). compare and imports exit with status 1 on a slowdown or a failed budget.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+import numpy as np
+
+#Modules used by worker processes, the CLI and sweeps
+HEADLESS_MODULES = ('engine', 'section_funcs', 'functions', 'analytic', 'node_index',
+                    'section_cache', 'sweep', 'mesh_control', 'profiling', 'results_store')
+
+#Packages the headless modules may only import when a function needs them
+DEFERRED_PACKAGES = ('streamlit', 'matplotlib', 'handcalcs', 'PIL', 'streamlit_drawable_canvas',
+                     'forallpeople', 'sectionproperties')
+
+#Cold import budget of each headless module, in seconds
+IMPORT_BUDGET = 0.5
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, sorted({{name.split('.')[0] for name in sys.modules}} & set({packages!r}))]))
+"""
+
+def import_time(module, repeat=3):
+    """
+    Best time (s) over repeat cold imports of module in a fresh interpreter,
+    excluding interpreter start-up, and the deferred packages it imported.
+    """
+    script = _IMPORT_SCRIPT.format(module=module, packages=DEFERRED_PACKAGES)
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        seconds, imported = json.loads(output.splitlines()[-1])
+        best = seconds if best is None else min(best, seconds)
+    return best, imported
+
+def check_imports(modules=HEADLESS_MODULES, budget=IMPORT_BUDGET, repeat=3):
+    """Import time of each module against the budget, as a list of result dicts"""
+    results = []
+    for module in modules:
+        seconds, imported = import_time(module, repeat)
+        results.append({'module': module, 'seconds': seconds, 'deferred_imported': imported,
+                        'ok': seconds <= budget and not imported})
+    return results
+
+#Design grid of the stage benchmarks
+BENCH_N_STIF = (2, 3, 6)
+BENCH_SIZES = ((1.0, 1.0), (2.0, 1.5)) #(b, d) in m
+BENCH_MESH_SCALES = (2.0, 1.0, 0.5) #2.0 gives the coarsest mesh the plates allow
+
+#Seed of the random load cases used by the superposition benchmark
+SEED = 0
+N_CASES = 1000
+
+def _best_time(func, repeat=5):
+    """Best time per call (s) of func over repeat runs of an automatically sized loop"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+def stage_benchmarks(n_stif, b, d, mesh_scale, repeat=5):
+    """
+    Time every calculation stage for one design.
+    Returns a dict of stage name: best seconds per call, and the element count.
+    The numeric cores of K_buckling and flange_yield (K_value and
+    flange_yield.value) are timed, without the Streamlit and LaTeX output.
+    """
+    import engine
+    import functions as fnc
+    import node_index
+    import section_funcs
+
+    design = {**engine.DESIGN_DEFAULTS, 'b': b, 'd': d, 'n_stif': n_stif, 'mesh_scale': mesh_scale}
+    loads = engine.LOAD_DEFAULTS
+    plates = [design[key] for key in ('b', 'd', 't_w', 't_f', 'd_stif', 't_stif', 'n_stif')]
+    section = section_funcs.boxsection(*plates, mesh_scale)
+    actions = [loads[action] for action in section_funcs.UNIT_ACTIONS]
+    times = {}
+
+    times['boxsection'] = _best_time(lambda: section_funcs.boxsection(*plates, mesh_scale), repeat)
+    times['geometric_properties'] = _best_time(lambda: section.calculate_geometric_properties(), repeat)
+    times['warping_properties'] = _best_time(lambda: section.calculate_warping_properties(), repeat)
+    times['calculate_stress'] = _best_time(lambda: section.calculate_stress(Vy=loads['Fy'], Vx=loads['Fz'], Mxx=loads['Mz'],
+                                                                            Myy=loads['My'], Mzz=loads['Mx']), repeat)
+    times['recover_stresses'] = _best_time(lambda: section_funcs.recover_stresses(section,*actions), repeat)
+
+    stresses = section_funcs.recover_stresses(section,*actions)
+    nodes = np.asarray(section.mesh_nodes)
+    boxes = list(engine.critical_boxes(b,d,design['t_w'],design['t_f'],n_stif).values())
+    times['stress_location'] = _best_time(lambda: [section_funcs.stress_location(*box[:4],nodes,stresses['sig_zz_m'],box[4])
+                                                   for box in boxes], repeat)
+    times['node_index_aggregate'] = _best_time(lambda: node_index.NodeIndex(nodes).aggregate(stresses['sig_zz_m'],boxes), repeat)
+
+    unit = section_funcs.unit_stresses(section)
+    cases = np.random.default_rng(SEED).normal(0, 1, (N_CASES, len(actions))) * actions
+    times['superpose_stresses'] = _best_time(lambda: section_funcs.superpose_stresses(unit,cases), repeat)
+
+    b_flange, b_web = fnc.longit_stif_spacing.value(b,d,n_stif,n_stif)
+    times['K_buckling'] = _best_time(lambda: fnc.K_value(n_stif,design['a_panel'],b_flange,design['t_f'],design['f_y']), repeat)
+    times['flange_yield'] = _best_time(lambda: fnc.flange_yield.value(30e6,5e6,200e6), repeat)
+    return times, len(section.mesh_elements)
+
+def run_benchmarks(n_stifs=BENCH_N_STIF, sizes=BENCH_SIZES, mesh_scales=BENCH_MESH_SCALES, repeat=5, progress=print):
+    """Stage benchmarks over the design grid, as a dict of run metadata and result rows"""
+    rows = []
+    for n_stif, (b, d), mesh_scale in itertools.product(n_stifs, sizes, mesh_scales):
+        case = f'n{n_stif}-{b:g}x{d:g}-m{mesh_scale:g}'
+        times, elements = stage_benchmarks(n_stif, b, d, mesh_scale, repeat)
+        rows += [{'case': case, 'stage': stage, 'n_stif': n_stif, 'b': b, 'd': d, 'mesh_scale': mesh_scale,
+                  'elements': elements, 'seconds': seconds} for stage, seconds in times.items()]
+        progress(f"{case}: {elements} elements, {sum(times.values()):.3f} s")
+    meta = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'machine': platform.machine(), 'processor': platform.processor(), 'seed': SEED}
+    return {'meta': meta, 'results': rows}
+
+def compare(baseline, current, threshold=0.1, min_delta=1e-5):
+    """
+    Compare two benchmark results (as written by run) stage by stage.
+    Returns (rows, missing): rows is a list of (case, stage, baseline s, current s,
+    ratio, slower) for the rows present in both, where slower flags a ratio above
+    1 + threshold for stages at least min_delta seconds slower (to ignore timer
+    noise), and missing the (case, stage) of baseline rows absent from current.
+    """
+    base = {(row['case'], row['stage']): row['seconds'] for row in baseline['results']}
+    rows = []
+    for row in current['results']:
+        key = (row['case'], row['stage'])
+        if key in base:
+            ratio = row['seconds'] / base[key]
+            rows.append(key + (base[key], row['seconds'], ratio,
+                               ratio > 1 + threshold and row['seconds'] - base[key] > min_delta))
+    found = {row[:2] for row in rows}
+    missing = [key for key in base if key not in found]
+    return rows, missing
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the box girder calculation code")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help="time every calculation stage over the design grid")
+    run.add_argument('output', help="JSON file the results are written to")
+    run.add_argument('--quick', action='store_true', help="only the first n_stif, size and mesh density")
+    run.add_argument('--repeat', type=int, default=5, help="timing repeats per stage (best is kept)")
+    comparison = commands.add_parser('compare', help="flag stages slower than a baseline")
+    comparison.add_argument('baseline', help="JSON results of the baseline run")
+    comparison.add_argument('current', help="JSON results of the run to check")
+    comparison.add_argument('--threshold', type=float, default=0.1, help="relative slowdown flagged (default 0.1)")
+    comparison.add_argument('--min-delta', type=float, default=1e-5, help="absolute slowdown in s below which stages are not flagged")
+    imports = commands.add_parser('imports', help="cold import time of the headless modules")
+    imports.add_argument('--budget', type=float, default=IMPORT_BUDGET, help="seconds allowed per module")
+    imports.add_argument('--repeat', type=int, default=3, help="imports timed per module (best is kept)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        grid = (BENCH_N_STIF[:1], BENCH_SIZES[:1], BENCH_MESH_SCALES[:1]) if args.quick else ()
+        results = run_benchmarks(*grid, repeat=args.repeat)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+        return 0
+
+    if args.command == 'compare':
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows, missing = compare(baseline, current, args.threshold, args.min_delta)
+        for case, stage, base, seconds, ratio, slower in rows:
+            flag = 'SLOWER' if slower else ''
+            print(f"{case:<18} {stage:<22} {base*1e3:10.3f} ms {seconds*1e3:10.3f} ms {ratio:6.2f}x {flag}")
+        for case, stage in missing:
+            print(f"{case:<18} {stage:<22} not in {args.current}")
+        return 1 if any(row[-1] for row in rows) else 0
+
+    if args.command == 'imports':
+        results = check_imports(budget=args.budget, repeat=args.repeat)
+        for result in results:
+            status = 'ok' if result['ok'] else 'FAIL'
+            extra = ' imports ' + ', '.join(result['deferred_imported']) if result['deferred_imported'] else ''
+            print(f"{result['module']:<15} {result['seconds']:7.3f} s  {status}{extra}")
+        return 0 if all(result['ok'] for result in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
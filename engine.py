@@ -0,0 +1,281 @@
+"""
+Headless design engine for the stiffened box girder checks.
+
+Runs the same calculation chain as main() (stiffener spacing -> box section ->
+section analysis -> stresses -> critical stresses -> flange yield -> K buckling)
+without any Streamlit, matplotlib or LaTeX work.
+
+All design and load values are plain floats in SI units (m, Pa, N, Nm).
+"""
+from multiprocessing import Pool
+
+import numpy as np
+
+import analytic
+import functions as fnc
+import node_index
+import profiling
+import section_cache
+import section_funcs
+
+#Default design record, matching the default sidebar inputs of main()
+DESIGN_DEFAULTS = {
+    'b': 1.0,
+    'd': 1.0,
+    't_w': 0.012,
+    't_f': 0.012,
+    'n_stif': 3,
+    'n_stif_web': None, #None for the same number of stiffeners on the webs as on the flange
+    'd_stif': 0.1,
+    't_stif': 0.012,
+    'a_panel': 1.0,
+    'f_y': 350e6,
+    'E_s': 200e9,
+    'phi': 0.9,
+    'mesh_scale': 1.0,
+}
+
+#Default actions, matching the default sidebar inputs of main()
+LOAD_DEFAULTS = {
+    'Fx': 100e3,
+    'Fy': 100e3,
+    'Fz': 100e3,
+    'Mx': 100e3,
+    'My': 1000e3,
+    'Mz': 1000e3,
+}
+
+#Inputs of boxgenerator and the mesh density, which define a unique section analysis
+GEOMETRY_KEYS = ('b', 'd', 't_w', 't_f', 'd_stif', 't_stif', 'n_stif', 'mesh_scale', 'n_stif_web')
+
+def geometry_key(design):
+    """Hashable key of the inputs that define the meshed section"""
+    return tuple(design[key] for key in GEOMETRY_KEYS)
+
+def build_section(design,cache=None,dtype=np.float64):
+    """
+    Build, mesh and analyse the cross section for a design record.
+    Returns a section_funcs.SectionData with unit stress fields of dtype,
+    read from the section_cache.SectionCache (and its dtype) if given.
+    """
+    if cache is not None:
+        return cache.section(*geometry_key(design))
+    section = section_funcs.boxsection(*geometry_key(design))
+    return section_funcs.section_data(section_funcs.analyse_section(section),dtype)
+
+def critical_boxes(b,d,t_w,t_f,n_stif,n_stif_web=None):
+    """
+    Regions of the section used for each critical stress, as
+    name: (x, y, tol_x, tol_y, result_type) for section_funcs.stress_location
+    """
+    n_stif_web = section_funcs.web_stiffeners(n_stif,n_stif_web)
+    x_f_stif,y_f_stif,x_w_stif,y_w_stif,x_f_mid,y_f_mid,x_w_mid,y_w_mid = fnc.stress_locations(b,d,t_f,t_w,n_stif,n_stif_web)
+    return {
+        'f_star_s_fl': (x_f_stif,y_f_stif,0.05,0.05,'max'),
+        'f_star_s_web': (x_w_stif,y_w_stif,0.05,0.05,'max'),
+        'f_star_s_fl_mid': (x_f_mid,y_f_mid,0.05,0.05,'max'),
+        'f_star_s_web_mid': (x_w_mid,y_w_mid,0.05,0.05,'max'),
+        'f_star_s_fl_mean': (b/2,d,b/2,t_f,'mean'),
+    }
+
+def critical_stresses(section,stresses,b,d,t_w,t_f,n_stif,n_stif_web=None):
+    """
+    Extract the stresses at the critical locations used by the clause checks
+    from nodal stresses as returned by section_funcs.section_stresses (a list of stress dicts,
+    of which only sig_zz_m, sig_zy_vy and sig_zxy_mzz are read)
+    """
+    sig_zz_m = stresses[0]['sig_zz_m']
+    crit = {
+        'f_star_s_comp': sig_zz_m.max(),
+        'f_star_s_tens': sig_zz_m.min(),
+    }
+    boxes = critical_boxes(b,d,t_w,t_f,n_stif,n_stif_web)
+    with profiling.span('stress_location', nodes=len(sig_zz_m), boxes=len(boxes)):
+        crit.update(zip(boxes, node_index.section_index(section).aggregate(sig_zz_m,list(boxes.values()))))
+    crit['f_star_v'] = stresses[0]['sig_zy_vy'].max()
+    crit['f_star_vt'] = stresses[0]['sig_zxy_mzz'].max()
+    return crit
+
+def check_design(design,loads,section=None,method='fe'):
+    """
+    Evaluate one design record under one set of loads.
+    A previously analysed SectionData for the same geometry may be passed in.
+    method: 'fe' for the sectionproperties analysis or 'analytic' for the
+    closed-form thin-walled engine (see analytic.py)
+    Returns a flat result record (dict of floats and bools).
+    """
+    design = {**DESIGN_DEFAULTS, **design}
+    loads = {**LOAD_DEFAULTS, **loads}
+    b, d, t_w, t_f, n_stif = design['b'], design['d'], design['t_w'], design['t_f'], design['n_stif']
+    n_stif_web = section_funcs.web_stiffeners(n_stif,design['n_stif_web'])
+
+    b_flange, b_web = fnc.longit_stif_spacing.value(b,d,n_stif,n_stif_web)
+    result = {
+        'b_flange': b_flange,
+        'b_web': b_web,
+    }
+
+    if method == 'analytic':
+        plates = [design[key] for key in ('b', 'd', 't_w', 't_f', 'd_stif', 't_stif', 'n_stif')] + [n_stif_web]
+        rects = analytic.box_rectangles(*plates)
+        props = analytic.section_properties(rects,*plates)
+        crit = analytic.critical_stresses(rects,props,critical_boxes(b,d,t_w,t_f,n_stif,n_stif_web),loads,b,d,t_w,t_f)
+    else:
+        if section is None:
+            section = build_section(design)
+        props = section.props
+        crit = fe_critical_stresses(section,design,loads)
+    result.update(props)
+    result.update(crit)
+    result.update(clause_checks(design,crit))
+    return result
+
+def fe_critical_stresses(section,design,loads):
+    """Critical stresses of a design from its SectionData, by unit-load superposition"""
+    actions = [loads[action] for action in section_funcs.UNIT_ACTIONS]
+    stresses = section_funcs.superpose_stresses(section.unit,actions)
+    return critical_stresses(section,[{key: field[0] for key, field in stresses.items()}],
+                             design['b'],design['d'],design['t_w'],design['t_f'],design['n_stif'],design['n_stif_web'])
+
+def clause_checks(design,crit):
+    """Flange yield (Cl 7.3.3.1) and K_c (Cl 7.3.3.2) from the critical stresses of a design"""
+    n_stif_web = section_funcs.web_stiffeners(design['n_stif'],design['n_stif_web'])
+    b_flange, b_web = fnc.longit_stif_spacing.value(design['b'],design['d'],design['n_stif'],n_stif_web)
+    result = {}
+
+    #Cl 7.3.3.1 - Yielding of flange plate
+    f_star_comb = fnc.flange_yield.value(crit['f_star_vt'],crit['f_star_v'],crit['f_star_s_fl_mid'])
+    phi_f_y = design['phi'] * design['f_y']
+    result['f_star_comb'] = f_star_comb
+    result['util_flange_yield'] = f_star_comb / phi_f_y
+    result['flange_yield_pass'] = bool(f_star_comb <= phi_f_y)
+
+    #Cl 7.3.3.2 - Effective section of flange stiffener
+    K_c, K_cv1, K_cv2, K_cv3, lamda_kc_a, lamda_kc_b = fnc.K_value(design['n_stif'],design['a_panel'],b_flange,design['t_f'],design['f_y'])
+    result['K_c'] = K_c
+    result['lamda_kc_a'] = lamda_kc_a
+    result['lamda_kc_b'] = lamda_kc_b
+    return result
+
+def _check_jobs(design,jobs,get_section,method='fe',errors=False):
+    """
+    Check every (index, design, loads) job sharing the section of design.
+    With errors=True a failing job gives {'error': message} instead of raising.
+    """
+    results = []
+    try:
+        section = get_section(design) if method == 'fe' else None
+    except Exception as error:
+        if not errors:
+            raise
+        return [(index, {'error': repr(error)}) for index, job_design, job_loads in jobs]
+    for index, job_design, job_loads in jobs:
+        try:
+            results.append((index, check_design(job_design,job_loads,section,method)))
+        except Exception as error:
+            if not errors:
+                raise
+            results.append((index, {'error': repr(error)}))
+    return results
+
+def group_by_geometry(jobs):
+    """
+    Group (index, design, ...) jobs by the section geometry of their design,
+    returning a list of the job lists sharing one section, in first-seen order.
+    """
+    groups = {}
+    for job in jobs:
+        groups.setdefault(geometry_key(job[1]), []).append(job)
+    return list(groups.values())
+
+def map_groups(func, tasks, processes=None):
+    """
+    Yield func(task) for every section group task as each finishes.
+    processes: number of worker processes (None = one per core, 1 = in this process);
+    a single task also runs in this process
+    """
+    if processes == 1 or len(tasks) <= 1:
+        yield from map(func, tasks)
+    else:
+        with Pool(processes) as pool:
+            yield from pool.imap_unordered(func, tasks)
+
+def _check_group(args):
+    """Worker for run_batch: analyse one section and check every design sharing it"""
+    design, jobs, cache_args, dtype, method, errors = args
+    cache = cache_args and section_cache.SectionCache(*cache_args)
+    return _check_jobs(design,jobs,lambda design: build_section(design,cache,dtype),method,errors)
+
+class DesignEngine:
+    """
+    Importable engine for evaluating box girder designs without the UI.
+    Analysed sections are kept in memory, keyed by their geometry inputs,
+    so designs that only differ in a_panel, material or loads reuse them.
+    cache: optional section_cache.SectionCache persisting sections between runs
+    dtype: dtype of the unit stress fields held per section when not cached
+    (np.float32 halves their memory in large sweeps)
+    store: optional results_store.ResultsStore; designs it holds are not re-evaluated
+    and new results are written to it
+    """
+    def __init__(self, max_sections=64, cache=None, dtype=np.float64, store=None):
+        self.max_sections = max_sections
+        self.cache = cache
+        self.dtype = dtype
+        self.store = store
+        self.sections = {}
+
+    def section(self, design):
+        """Return the analysed section for a design, building it if needed"""
+        design = {**DESIGN_DEFAULTS, **design}
+        key = geometry_key(design)
+        if key not in self.sections:
+            if len(self.sections) >= self.max_sections:
+                self.sections.pop(next(iter(self.sections)))
+            self.sections[key] = build_section(design,self.cache,self.dtype)
+        return self.sections[key]
+
+    def unit_stresses(self, design):
+        """Return the unit-action stress fields for a design's section (see section_funcs.unit_stresses)"""
+        return self.section(design).unit
+
+    def evaluate(self, design, loads=None, method='fe'):
+        """Evaluate one design record and return its result record"""
+        return self.run_batch([(design, loads)], 1, method)[0]
+
+    def run_batch(self, records, processes=None, method='fe', errors=False):
+        """
+        Evaluate a list of (design, loads) records.
+        Records are grouped by section geometry so each section is analysed once.
+        processes: number of worker processes (None = one per core, 1 = in this process)
+        method: 'fe' or 'analytic', as per check_design
+        errors: if True, a failing record gives {'error': message} instead of raising
+        Returns the result records in input order.
+        """
+        if self.store is None:
+            return self._run_batch(records, processes, method, errors)
+        results = self.store.get_many(records, method)
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            computed = self._run_batch([records[index] for index in missing], processes, method, errors)
+            for index, result in zip(missing, computed):
+                results[index] = result
+            self.store.put_many([(*records[index], results[index]) for index in missing], method)
+        return results
+
+    def _run_batch(self, records, processes, method, errors):
+        """Evaluate (design, loads) records as per run_batch, without the results store"""
+        groups = group_by_geometry((index, {**DESIGN_DEFAULTS, **design}, loads or {})
+                                   for index, (design, loads) in enumerate(records))
+
+        results = [None] * len(records)
+        if processes == 1 or len(groups) <= 1 or method == 'analytic':
+            for jobs in groups:
+                for index, result in _check_jobs(jobs[0][1],jobs,self.section,method,errors):
+                    results[index] = result
+        else:
+            cache_args = (self.cache.root, self.cache.max_bytes, self.cache.dtype) if self.cache is not None else None
+            tasks = [(jobs[0][1], jobs, cache_args, self.dtype, method, errors) for jobs in groups]
+            for group in map_groups(_check_group, tasks, processes):
+                for index, result in group:
+                    results[index] = result
+        return results
@@ -1,62 +1,128 @@
-#Import streamlit
-import streamlit as st
-
 #Math and array modules
 from math import sqrt, cos, sin, pi, atan
+import functools
 import numpy as np
 from bisect import bisect_right
 
-#Section properties module
-import sectionproperties.pre.sections as sections
-from sectionproperties.analysis.cross_section import CrossSection
-
 #Import other py files
+import plots
 import section_funcs
 
-#Import handcalcs
-from handcalcs import handcalc
+#Streamlit, handcalcs and matplotlib are only imported by the report functions
+#that use them, so the numeric checks can be imported headless
 
-#Import unit aware modules
-import forallpeople as u
-u.environment('structural')
+def dual_mode(func):
+    """
+    Decorate a clause check with handcalcs for the interactive report, keeping
+    the plain numeric function as .value for batch and sweep runs.
+    check(...) returns (latex, result) as before; check.value(...) returns only
+    the result and accepts floats or NumPy arrays without building any LaTeX.
+    handcalcs is imported and the check rendered on the first check(...) call.
+    """
+    rendered = []
 
-import matplotlib.pyplot as plt
+    @functools.wraps(func)
+    def check(*args, **kwargs):
+        if not rendered:
+            from handcalcs import handcalc
+            rendered.append(handcalc(override="long")(func))
+        return rendered[0](*args, **kwargs)
+    check.value = func
+    return check
 
-@handcalc(override="long")
-def longit_stif_spacing(b, d, n_stif):
+@dual_mode
+def longit_stif_spacing(b, d, n_stif, n_stif_web):
     b_flange = b / (n_stif + 1)
-    b_web = d / (n_stif + 1)
+    b_web = d / (n_stif_web + 1)
     return b_flange, b_web
 
-def stress_locations(b,d,t_f,t_w,n_stif: int):
+def stress_locations(b,d,t_f,t_w,n_stif: int,n_stif_web: int = None):
     """
     Calculate the critical locations to be used for determining stresses
     within the sectionproperties module
+    n_stif_web: number of stiffeners on each web (None for the same as n_stif)
     """
+    if n_stif_web is None:
+        n_stif_web = n_stif
     x_f_stif = b/(n_stif+1) #x-coord of the critical flange stiffener next to the highly stressed top left corner.
     y_f_stif = d - t_f #y-coord of above
 
     x_w_stif = t_w #x-coord of the critical web stiffener closest to the highly stressed top left corner.
-    y_w_stif = d - d/(n_stif+1) #y-coord of above
+    y_w_stif = d - d/(n_stif_web+1) #y-coord of above
 
     x_f_mid = b/(n_stif+1)/2 #x-coord of the mid-plane of the critical flange-plate for yield checks only (Cl.7.3.2)
     y_f_mid = d - t_f/2 #y-coord of the mid-plane of the critical flange plate
 
     x_w_mid = t_w/2
-    y_w_mid = d - d/(n_stif+1)/2 #location of the mid-plane of the critical web-plate for yield checks only (Cl.7.3.2)
+    y_w_mid = d - d/(n_stif_web+1)/2 #location of the mid-plane of the critical web-plate for yield checks only (Cl.7.3.2)
     
     return x_f_stif,y_f_stif,x_w_stif,y_w_stif,x_f_mid,y_f_mid,x_w_mid,y_w_mid
 
-@handcalc(override="long")
+@dual_mode
 def flange_yield(f_star_vt,f_star_v,f_star_s_fl_mid):
     f_star_vf = f_star_vt + 0.5 * f_star_v
     f_star_comb = (f_star_s_fl_mid**2 + 3 * f_star_vf**2)**0.5
     return f_star_comb
 
+#Cl 7.4.2 - the web carries the full shear, rather than half of it as in a flange
+@dual_mode
+def web_yield(f_star_vt,f_star_v,f_star_s_web_mid):
+    f_star_vw = f_star_vt + f_star_v
+    f_star_comb = (f_star_s_web_mid**2 + 3 * f_star_vw**2)**0.5
+    return f_star_comb
+
+#Points for each curve of Fig 7.3.3.2 / Fig 7.4.3.3(A)
+x_k = np.array([0,10,25,30, 50, 100, 130,150, 250]) # get several x data points
+y_k_cv1 = np.array([1,1,1,0.89, 0.68, 0.4, 0.317,0.31, 0.27]) #get several y data points
+y_k_cv2 = np.array([1,1,1,0.86, 0.58, 0.32, 0.257,0.255, 0.242]) #get several y data points
+y_k_cv3 = np.array([1,1,0.54,0.46, 0.17, 0.045, 0.025,0.02, 0.01]) #get several y data points
+
+def K_value(n_stif,a_panel,b_panel,t,f_y):
+    '''Numeric part of K_buckling with no plotting or Streamlit output.
+    Inputs as per K_buckling, as scalars or NumPy arrays that broadcast together,
+    so whole arrays of panels can be evaluated in one call.
+    For n_stif >= 3 the greater of Curve 1 and Curve 3 is used,
+    for n_stif = 2 the greater of ave(Curve 1 + Curve 2) and Curve 3.
+
+    Output:
+    K: Buckling coefficient (NaN where n_stif < 2)
+    K_cv1, K_cv2, K_cv3: Coefficient from each curve
+    lamda_k_a: Slenderness in 'a' direction
+    lamda_k_b: Slenderness in 'b' direction
+    '''
+    n_stif = np.asarray(n_stif)
+    lamda_k_a = np.asarray(a_panel)/t * np.sqrt(np.asarray(f_y)/(355 * 10**6)) #Slenderness in between transverse stiffeners
+    lamda_k_b = np.asarray(b_panel)/t * np.sqrt(np.asarray(f_y)/(355 * 10**6)) #Slenderness in between longitudinal stiffeners
+    K_cv1 = np.minimum(1.0,np.interp(lamda_k_b,x_k,y_k_cv1))
+    K_cv2 = np.minimum(1.0,np.interp(lamda_k_b,x_k,y_k_cv2))
+    K_cv3 = np.minimum(1.0,np.interp(lamda_k_a,x_k,y_k_cv3))
+
+    K = np.where(n_stif >= 3, np.maximum(K_cv1,K_cv3),
+                 np.where(n_stif == 2, np.maximum((K_cv1+K_cv2)/2,K_cv3), np.nan))
+    return K[()], K_cv1[()], K_cv2[()], K_cv3[()], lamda_k_a[()], lamda_k_b[()]
+
+def plot_K_buckling(K,K_cv1,K_cv3,lamda_k_a,lamda_k_b):
+    '''Plot the K curves with the governing point (red) and the other curve's point (blue)
+    for one panel, using the outputs of K_value. Returns the figure and axes.'''
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.plot(x_k,y_k_cv1,label="Curve 1")
+    ax.plot(x_k,y_k_cv2,label="Curve 2")
+    ax.plot(x_k,y_k_cv3,label="Curve 3")
+    ax.legend()
+    if K > K_cv3: #Curve 1 (or ave of Curve 1 & 2) governs
+        ax.plot(lamda_k_b,K,'ro')
+        ax.plot(lamda_k_a,K_cv3,'bx')
+    else:
+        ax.plot(lamda_k_a,K,'ro')
+        ax.plot(lamda_k_b,K_cv1,'bx')
+    return fig, ax
+
 def K_buckling(n_stif,a_panel,b_panel,t,f_y):
     '''Function defines a method for calculating the K-value from the curve Fig 7.3.3.2 or Fig 7.4.3.3(A):
     Input params:
-    n_stif: number of longitudinal stiffeners 2 and 3 accepted
+    n_stif: number of longitudinal stiffeners, 2 or more accepted
     a_panel: length along beam between transverse stiffeners
     b_panel: width perpendicular to beam between longitudinal stiffeners
     t: thickness of main plate
@@ -66,25 +132,13 @@ def K_buckling(n_stif,a_panel,b_panel,t,f_y):
     K: Buckling coefficient
     lamda_k_a: Slenderness in 'a' direction
     lamda_k_b: Slenderness in 'b' direction
+    figure: plot of the curves as a plots.LazyFigure, drawn only when shown
     '''
+    import streamlit as st
+
     #All inputs in SI units
     #Outputs include 
-    lamda_k_a = a_panel/t * sqrt(f_y/(355 * 10**6)) #Slenderness in between transverse stiffeners
-    lamda_k_b = b_panel/t * sqrt(f_y/(355 * 10**6)) #Slenderness in between longitudinal stiffeners
-    #Set out the points for each curve.
-    x_k = np.array([0,10,25,30, 50, 100, 130,150, 250]) # get several x data points
-    y_k_cv1 = np.array([1,1,1,0.89, 0.68, 0.4, 0.317,0.31, 0.27]) #get several y data points
-    y_k_cv2 = np.array([1,1,1,0.86, 0.58, 0.32, 0.257,0.255, 0.242]) #get several y data points
-    y_k_cv3 = np.array([1,1,0.54,0.46, 0.17, 0.045, 0.025,0.02, 0.01]) #get several y data points
-    K_cv1 = min(1.0,np.interp(lamda_k_b,x_k,y_k_cv1))
-    K_cv2 = min(1.0,np.interp(lamda_k_b,x_k,y_k_cv2))
-    K_cv3 = min(1.0,np.interp(lamda_k_a,x_k,y_k_cv3))
-    
-    fig, ax = plt.subplots()
-    ax.plot(x_k,y_k_cv1,label="Curve 1")
-    ax.plot(x_k,y_k_cv2,label="Curve 2")
-    ax.plot(x_k,y_k_cv3,label="Curve 3")
-    ax.legend()
+    K, K_cv1, K_cv2, K_cv3, lamda_k_a, lamda_k_b = K_value(n_stif,a_panel,b_panel,t,f_y)
     st.text(f'Lamda_k_b (Crv 1/2) = {lamda_k_b:0.2f}\n'
           f'Lamda_k_a (Crv 3) {lamda_k_a:0.2f}\n')
 
@@ -92,33 +146,17 @@ def K_buckling(n_stif,a_panel,b_panel,t,f_y):
           f'K_cv1 = {K_cv1:0.3f}\n'
           f'K_cv2 = {K_cv2:0.3f}\n'
           f'K_cv3 = {K_cv3:0.3f}\n')
-    
-    if n_stif == 3:
-        if K_cv1 > K_cv3:
-            K = K_cv1
-            ax.plot(lamda_k_b,K,'ro')
-            ax.plot(lamda_k_a,K_cv3,'bx')
-            st.text(f'The highest value to be used is K_cv1 = {K:0.3f}\n')
-            return K, lamda_k_a, lamda_k_b, fig, ax
-        else:
-            K = K_cv3
-            ax.plot(lamda_k_a,K,'ro')
-            ax.plot(lamda_k_b,K_cv1,'bx')
-            st.text(f'The highest value to be used is K_cv3 = {K:0.3f}\n')
-            return K, lamda_k_a, lamda_k_b, fig, ax
-    elif n_stif == 2:
-        if (K_cv1+K_cv2)/2 > K_cv3:
-            K = (K_cv1+K_cv2)/2
-            ax.plot(lamda_k_b,K,'ro')
-            ax.plot(lamda_k_a,K_cv3,'bx')
-            st.text(f'The highest value to be used is:\nave(K_cv1 & K_cv2): {K:0.3f}\n')
-            return K, lamda_k_a, lamda_k_b, fig, ax
-        else:
-            K = K_cv3
-            ax.plot(lamda_k_a,K,'ro')
-            ax.plot(lamda_k_b,K_cv1,'bx')
-            st.text(f'The highest value to be used is K_cv3 = {K:0.3f}\n')
-            return K, lamda_k_a, lamda_k_b, fig, ax
-    else:
+
+    if n_stif < 2:
         st.text("Number of stiffeners not programmed into calculation")
-        return None, lamda_k_a, lamda_k_b, None,None
\ No newline at end of file
+        return None, lamda_k_a, lamda_k_b, None
+
+    figure = plots.LazyFigure(plots.figure_key('K_buckling', n_stif=n_stif, a_panel=a_panel, b_panel=b_panel, t=t, f_y=f_y),
+                              lambda: plot_K_buckling(K,K_cv1,K_cv3,lamda_k_a,lamda_k_b))
+    if K > K_cv3 and n_stif >= 3:
+        st.text(f'The highest value to be used is K_cv1 = {K:0.3f}\n')
+    elif K > K_cv3:
+        st.text(f'The highest value to be used is:\nave(K_cv1 & K_cv2): {K:0.3f}\n')
+    else:
+        st.text(f'The highest value to be used is K_cv3 = {K:0.3f}\n')
+    return K, lamda_k_a, lamda_k_b, figure
@@ -0,0 +1,85 @@
+"""
+Bulk load-case envelopes using unit-load stress superposition.
+
+The four unit-action stress fields of a section (section_funcs.UNIT_FIELDS)
+are computed once by section_funcs.unit_stresses and every load case is then a matrix product
+over the mesh nodes, so thousands of combinations can be enveloped without
+another stress recovery.
+
+Load case columns are Fx, Fy, Fz, Mx, My, Mz in N and Nm, with an optional
+'case' column naming each combination.
+"""
+import numpy as np
+import pandas as pd
+
+import engine
+import functions as fnc
+import node_index
+import section_funcs
+
+#Critical stresses reported for each load case
+CASE_RESULTS = ('f_star_s_fl', 'f_star_s_web', 'f_star_s_fl_mid', 'f_star_s_web_mid',
+                'f_star_s_fl_mean', 'f_star_v', 'f_star_vt', 'f_star_comb', 'util_flange_yield')
+
+def read_load_cases(path):
+    """Read load cases from a CSV file, filling missing actions with zero"""
+    cases = pd.read_csv(path)
+    if 'case' not in cases.columns:
+        cases['case'] = cases.index
+    for action in section_funcs.UNIT_ACTIONS:
+        if action not in cases.columns:
+            cases[action] = 0.0
+    return cases
+
+def case_stresses(section,unit,design,cases,chunk_size=2000):
+    """
+    Critical stresses and flange yield utilisation for every load case.
+    section: SectionData as per engine.build_section, unit: its unit stress fields (section.unit)
+    design: design record as per engine.check_design
+    cases: DataFrame of load cases (see read_load_cases)
+    Returns a DataFrame with one row per load case.
+    """
+    design = {**engine.DESIGN_DEFAULTS, **design}
+    index = node_index.section_index(section)
+    boxes = engine.critical_boxes(design['b'],design['d'],design['t_w'],design['t_f'],design['n_stif'],design['n_stif_web'])
+
+    actions = cases[list(section_funcs.UNIT_ACTIONS)].to_numpy(dtype=float)
+    columns = {name: np.empty(len(actions)) for name in CASE_RESULTS}
+    for start in range(0, len(actions), chunk_size):
+        rows = slice(start, start + chunk_size)
+        sig = section_funcs.superpose_stresses(unit,actions[rows])
+        box_results = index.aggregate(sig['sig_zz_m'],list(boxes.values()))
+        for i, name in enumerate(boxes):
+            columns[name][rows] = box_results[:,i]
+        columns['f_star_v'][rows] = sig['sig_zy_vy'].max(axis=1)
+        columns['f_star_vt'][rows] = sig['sig_zxy_mzz'].max(axis=1)
+
+    #Cl 7.3.3.1 - Yielding of flange plate
+    columns['f_star_comb'] = fnc.flange_yield.value(columns['f_star_vt'],columns['f_star_v'],columns['f_star_s_fl_mid'])
+    columns['util_flange_yield'] = columns['f_star_comb'] / (design['phi'] * design['f_y'])
+
+    results = pd.DataFrame(columns)
+    results.insert(0, 'case', cases['case'].to_numpy())
+    return results
+
+def envelope(results):
+    """
+    Governing load case for each critical stress in the output of case_stresses.
+    Returns a DataFrame indexed by result name with the 'value' and governing 'case'.
+    """
+    rows = {}
+    for name in CASE_RESULTS:
+        governing = results[name].to_numpy().argmax()
+        rows[name] = {'value': results[name].iloc[governing], 'case': results['case'].iloc[governing]}
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+def run_envelope(design,cases,design_engine=None):
+    """
+    Envelope a table (or CSV path) of load cases for one design.
+    Returns (results per case, envelope of governing cases).
+    """
+    if isinstance(cases, str):
+        cases = read_load_cases(cases)
+    design_engine = design_engine or engine.DesignEngine()
+    results = case_stresses(design_engine.section(design),design_engine.unit_stresses(design),design,cases)
+    return results, envelope(results)
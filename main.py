@@ -1,22 +1,28 @@
 #Import streamlit modules
 import streamlit as st
+from streamlit.report_thread import get_report_ctx
 
 #Import associated py files with functions
 import functions as fnc
 import validation as vld
 import section_funcs
 import plots
-
-#Import data and plotting
+import engine
+import profiling
+import stage_graph
+import utilisation
+import monte_carlo
+import results_store
+import worker
+
+#Import data
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
 #Import unit aware modules
 import forallpeople as u
 u.environment('structural')
 
-from handcalcs import handcalc
-
 #Main function calls made at each run of Streamlit
 def main():
     """This function is run at the beginning of each script"""
@@ -79,7 +85,8 @@ def main():
 
     #Stiffener dimensions
     st.sidebar.markdown("## Input Stiffener dimensions")
-    n_stif = st.sidebar.radio("Number of stiffeners",(2,3))
+    n_stif = st.sidebar.number_input("Number of flange stiffeners",2,8,3,1,"%i")
+    n_stif_web = st.sidebar.number_input("Number of stiffeners on each web",2,8,3,1,"%i")
     d_stif = st.sidebar.slider('Depth/Height longit. stiffeners(mm)',50,300,100,step=5,format='%i') / 1000
     t_stif = st.sidebar.slider('Thickness longit. stiffeners (mm)',5,30,12,step=1,format='%i') / 1000
     d_stif_trans = st.sidebar.slider('Depth/Height tranv. stiffeners / diaphragm (mm)',50,300,100,step=5,format='%i') / 1000
@@ -87,7 +94,8 @@ def main():
     a_panel = st.sidebar.slider('Spacing of transverse stiffeners (mm)',300,3000,1000,step=50,format='%i') / 1000
 
     #Calculate stiffener dimensions
-    longit_stif_spacing_latex, longit_stif_spacing_vals = fnc.longit_stif_spacing(b * u.m, d * u.m, n_stif)
+    with profiling.span('latex'):
+        longit_stif_spacing_latex, longit_stif_spacing_vals = fnc.longit_stif_spacing(b * u.m, d * u.m, n_stif, n_stif_web)
     st.sidebar.latex(longit_stif_spacing_latex)
     b_flange,b_web = longit_stif_spacing_vals
 
@@ -142,38 +150,81 @@ def main():
         """)
 
     st.set_option('deprecation.showPyplotGlobalUse', False)
-    section, fig1, ax1 = section_funcs.boxgenerator(b,
-                                     d,
-                                     t_w,
-                                     t_f,
-                                     d_stif,
-                                     t_stif,
-                                     n_stif)
-    @st.cache
-    def calculate_section(section):
-        section.calculate_geometric_properties(time_info=False)
-        section.calculate_warping_properties(time_info=False)
-        return section
-    
-    section = calculate_section(section)
-
-    area = section.get_area()
-    (cx, cy) = section.get_c()
-    (ixx_c, iyy_c, ixy_c) = section.get_ic()
-
-    x_f_stif,y_f_stif,x_w_stif,y_w_stif,x_f_mid,y_f_mid,x_w_mid,y_w_mid = fnc.stress_locations(b * u.m,d * u.m,t_f * u.m,t_w * u.m,n_stif)
-
-    #Plot stress points to consider
-    ax1.plot(x_f_stif.value,y_f_stif.value,'ro')
-    ax1.annotate(f"Crit Flange Stiffener",(x_f_stif.value,y_f_stif.value),(x_f_stif.value+0.3,y_f_stif.value+0.3),arrowprops={'arrowstyle':'->'})
-    ax1.plot(x_w_stif.value,y_w_stif.value,'ro')
-    ax1.annotate(f"Crit Web Stiffener",(x_w_stif.value,y_w_stif.value),(x_w_stif.value-1.0,y_w_stif.value+0.3),arrowprops={'arrowstyle':'->'})
-    ax1.plot(x_f_mid.value,y_f_mid.value,'ro')
-    ax1.annotate(f"Crit flange panel",(x_f_mid.value,y_f_mid.value),(x_f_mid.value-0.4,y_f_mid.value+0.3),arrowprops={'arrowstyle':'->'})
-    ax1.plot(x_w_mid.value,y_w_mid.value,'ro')
-    ax1.annotate(f"Crit web panel",(x_w_mid.value,y_w_mid.value),(x_w_mid.value-0.4,y_w_mid.value+0.3),arrowprops={'arrowstyle':'->'})
- 
-    st.pyplot(fig1) #Plot the cross section shape of the box girder
+    # Each stage is memoised on its own inputs, so a change of loads or
+    # material only re-runs the stress superposition and the clause checks
+    @st.cache(allow_output_mutation=True)
+    def calculation_graph():
+        return stage_graph.design_graph()
+
+    graph = calculation_graph()
+
+    @st.cache(allow_output_mutation=True)
+    def stored_results():
+        return results_store.ResultsStore()
+
+    store = stored_results()
+    params = {**engine.DESIGN_DEFAULTS,
+              'b': b, 'd': d, 't_w': t_w, 't_f': t_f,
+              'n_stif': n_stif, 'n_stif_web': n_stif_web, 'd_stif': d_stif, 't_stif': t_stif, 'a_panel': a_panel,
+              'f_y': f_y, 'E_s': E_s, 'phi': phi,
+              'Fx': Fx, 'Fy': Fy, 'Fz': Fz, 'Mx': Mx, 'My': My, 'Mz': Mz}
+
+    # The section analysis runs in a background thread shared by all sessions,
+    # giving the analytic answer first and then the finite element result.
+    # Each new input cancels this session's previous job, and the short waits
+    # below let Streamlit stop this run as soon as an input changes.
+    @st.cache(allow_output_mutation=True)
+    def design_worker():
+        return worker.Worker(calculation_graph())
+
+    # Designs evaluated before (in any session) are read from the results store
+    summary = results_container.empty()
+    result = store.get(params, params)
+    if result is None:
+        job = design_worker().submit(get_report_ctx().session_id, params)
+        with profiling.span('background_job'):
+            while not job.wait(0.2):
+                stage, estimate = job.latest()
+                if estimate is None:
+                    summary.info("Analysing the section...")
+                else:
+                    summary.info(f"Analytic estimate: Util = {estimate['util_flange_yield']:.2f}, K_c = {estimate['K_c']:.2f} "
+                                 f"(refining with the finite element section...)")
+            profiling.merge(job.profiler) #the stages run on the worker thread
+        if isinstance(job.error, ValueError): #e.g. overlapping stiffeners
+            summary.error(f"Invalid geometry: {job.error}")
+            st.stop()
+        if job.error is not None:
+            raise job.error
+        if 'fe' not in job.results:
+            st.stop() #superseded by a newer run of this session
+        result = job.results['fe']
+        store.put(params, params, result)
+    summary.success(f"Util = {result['util_flange_yield']:.2f} ({'PASS' if result['flange_yield_pass'] else 'FAIL'}), "
+                    f"K_c = {result['K_c']:.2f}")
+
+    area, cx, cy, ixx_c, iyy_c = (result[key] for key in ('area', 'cx', 'cy', 'ixx_c', 'iyy_c'))
+
+    x_f_stif,y_f_stif,x_w_stif,y_w_stif,x_f_mid,y_f_mid,x_w_mid,y_w_mid = fnc.stress_locations(b * u.m,d * u.m,t_f * u.m,t_w * u.m,n_stif,n_stif_web)
+
+    def plot_section():
+        fig1, ax1 = section_funcs.plot_section(graph.get('geometry', params))
+        #Plot stress points to consider
+        ax1.plot(x_f_stif.value,y_f_stif.value,'ro')
+        ax1.annotate(f"Crit Flange Stiffener",(x_f_stif.value,y_f_stif.value),(x_f_stif.value+0.3,y_f_stif.value+0.3),arrowprops={'arrowstyle':'->'})
+        ax1.plot(x_w_stif.value,y_w_stif.value,'ro')
+        ax1.annotate(f"Crit Web Stiffener",(x_w_stif.value,y_w_stif.value),(x_w_stif.value-1.0,y_w_stif.value+0.3),arrowprops={'arrowstyle':'->'})
+        ax1.plot(x_f_mid.value,y_f_mid.value,'ro')
+        ax1.annotate(f"Crit flange panel",(x_f_mid.value,y_f_mid.value),(x_f_mid.value-0.4,y_f_mid.value+0.3),arrowprops={'arrowstyle':'->'})
+        ax1.plot(x_w_mid.value,y_w_mid.value,'ro')
+        ax1.annotate(f"Crit web panel",(x_w_mid.value,y_w_mid.value),(x_w_mid.value-0.4,y_w_mid.value+0.3),arrowprops={'arrowstyle':'->'})
+        return fig1, ax1
+
+    #Figures are only drawn when shown, and their images are cached by design
+    geometry_key = plots.figure_key('section', **{key: params[key] for key in engine.GEOMETRY_KEYS})
+    design_key = plots.figure_key('design', **{key: params[key] for key in engine.GEOMETRY_KEYS + section_funcs.UNIT_ACTIONS})
+    if st.checkbox("Show cross section", value=True):
+        st.image(plots.LazyFigure(geometry_key, plot_section).png(), use_column_width=True) #Plot the cross section shape of the box girder
 
     #Output section properties for box girder
     st.text(f'A: {area:.4f} m^2 \n\n'
@@ -182,41 +233,26 @@ def main():
     f'Second Moments of area are:\n'
     f'ixx_c = {ixx_c:.4f} m^4 \niyy_c = {iyy_c:.4f} m^4')
 
-    # Get stresses on beam
-    f_star_s_comp, f_star_s_tens, stresses = section_funcs.in_plane_principle(section,Fy,Fz,Mx,My,Mz)
-
-
-    f_star_s_fl = section_funcs.stress_location(x_f_stif.value,
-                              y_f_stif.value,
-                              0.05,
-                              0.05, 
-                              section.mesh_nodes, 
-                              stresses[0]['sig_zz_m'],
-                              'max')
-    f_star_s_web = section_funcs.stress_location(x_w_stif.value,
-                                y_w_stif.value,
-                                0.05,
-                                0.05,
-                                section.mesh_nodes,
-                                stresses[0]['sig_zz_m'],
-                                'max')
-    f_star_s_fl_mid = section_funcs.stress_location(x_f_mid.value,
-                                    y_f_mid.value,
-                                    0.05,
-                                    0.05, 
-                                    section.mesh_nodes, 
-                                    stresses[0]['sig_zz_m'],
-                                    'max')
-    f_star_s_web_mid = section_funcs.stress_location(x_w_mid.value,
-                                    y_w_mid.value,
-                                    0.05,
-                                    0.05,
-                                    section.mesh_nodes, 
-                                    stresses[0]['sig_zz_m'],
-                                    'max')
-    f_star_s_fl_mean = section_funcs.stress_location(b/2,d,b/2,t_f, section.mesh_nodes, stresses[0]['sig_zz_m'],"mean")
-    f_star_v = stresses[0]['sig_zy_vy'].max()
-    f_star_vt = stresses[0]['sig_zxy_mzz'].max()
+    # Stress contours need the full CrossSection, so it is only built when they are drawn
+    with st.beta_expander("Stress contours"):
+        if st.checkbox("Draw stress contours"):
+            f_star_s_comp, f_star_s_tens, stresses, (fig_m_zz, fig_v_zxy) = section_funcs.in_plane_principle(
+                graph.get('section', params),Fy,Fz,Mx,My,Mz,design_key)
+            col1, col2 = st.beta_columns(2)
+            col1.markdown("**Principle Stresses due to BM only**")
+            col1.image(fig_m_zz.png(), use_column_width=True)
+            col2.markdown("**Shear Stresses due to $F_y$ and $F_z$**")
+            col2.image(fig_v_zxy.png(), use_column_width=True)
+
+
+    crit = result
+    f_star_s_fl = crit['f_star_s_fl']
+    f_star_s_web = crit['f_star_s_web']
+    f_star_s_fl_mid = crit['f_star_s_fl_mid']
+    f_star_s_web_mid = crit['f_star_s_web_mid']
+    f_star_s_fl_mean = crit['f_star_s_fl_mean']
+    f_star_v = crit['f_star_v']
+    f_star_vt = crit['f_star_vt']
 
     st.text(f'The maximum stress in for the critical stiffeners is:\n'
       f'f_star_s_fl = {f_star_s_fl/1e6:.0f} MPa\n'
@@ -229,7 +265,8 @@ def main():
       f'The max torsion shear stress is:\n'
       f'f_star_vt = {f_star_vt/1e6:.0f} MPa')
 
-    flange_yield_latex, f_star_comb = fnc.flange_yield(f_star_vt * u.Pa,f_star_v * u.Pa,f_star_s_fl_mid * u.Pa)
+    with profiling.span('latex'):
+        flange_yield_latex, f_star_comb = fnc.flange_yield(f_star_vt * u.Pa,f_star_v * u.Pa,f_star_s_fl_mid * u.Pa)
     st.latex(flange_yield_latex)
 
     if f_star_comb > phi*f_y * u.Pa:
@@ -237,6 +274,18 @@ def main():
     else:
         st.success("PASS {0} < {1} Util = {2:.2f}".format(f_star_comb,phi*f_y * u.Pa,f_star_comb/(phi*f_y * u.Pa)))
 
+    #Flange yield check of every panel and stiffener
+    elements = graph.get('utilisation', params)
+    gov = utilisation.governing(elements)
+    gov_panel = utilisation.governing(elements, panel_pos)
+    st.text(f'Governing element: {gov["element"]}, Util = {gov["util"]:.2f}\n'
+            f'Governing {panel_pos} panel: {gov_panel["element"]}, Util = {gov_panel["util"]:.2f}')
+    with st.beta_expander("Utilisation of every panel and stiffener"):
+        table = elements[['element', 'position'] + list(utilisation.ELEMENT_RESULTS)].set_index('element')
+        table[['f_star_s', 'f_star_v', 'f_star_vt', 'f_star_comb']] /= 1e6
+        st.table(table.style.format({'f_star_s': '{:.0f}', 'f_star_v': '{:.0f}', 'f_star_vt': '{:.0f}',
+                                     'f_star_comb': '{:.0f}', 'util': '{:.2f}'}))
+
     with st.beta_expander("Effective section of flange stiffener"):
         st.markdown("""
         The slenderness of K_c value of the flange stiffeners are calculated in this section
@@ -258,7 +307,55 @@ def main():
         st.markdown("- Curve 3:")
         st.latex(r"\lambda_{ka} = \frac{a}{t}\sqrt{\frac{f_y}{355}}")
 
-    K_c, lamda_kc_a, lamda_kc_b, fig2, ax2 = fnc.K_buckling(n_stif,a_panel,b_flange.value,t_f,f_y)
-    st.pyplot(fig2)
+    with st.beta_expander("Probabilistic study"):
+        st.markdown("Samples $f_y$, the plate thicknesses, the pre-camber and the actions, "
+                    "and checks every sample by superposition on the nominal section.")
+        if st.checkbox("Run Monte Carlo study"):
+            mc_cols = st.beta_columns(3)
+            n_samples = mc_cols[0].number_input("Samples",1000,200000,20000,1000,"%i")
+            scatter = {'f_y': mc_cols[1].number_input("CoV of f_y",0.0,0.5,monte_carlo.DEFAULT_SCATTER['f_y'],0.01),
+                       't_f': mc_cols[2].number_input("CoV of thicknesses",0.0,0.5,monte_carlo.DEFAULT_SCATTER['t_f'],0.01),
+                       'camber': mc_cols[0].number_input("CoV of camber",0.0,2.0,monte_carlo.DEFAULT_SCATTER['camber'],0.05),
+                       'loads': mc_cols[1].number_input("CoV of actions",0.0,1.0,monte_carlo.DEFAULT_SCATTER['loads'],0.01)}
+            scatter['t_w'] = scatter['t_f']
+            with profiling.span('monte_carlo', samples=n_samples):
+                samples = monte_carlo.monte_carlo(params,params,n_samples,scatter,camb1,L,section=graph.get('unit_stresses', params))
+            summary = monte_carlo.summarise(samples)
+            st.text(f"Probability of flange yield failure = {summary['p_failure']:.2e} (+/- {summary['p_failure_se']:.1e})\n"
+                    f"Utilisation mean = {summary['util_flange_yield_mean']:.3f}, "
+                    f"95% = {summary['util_flange_yield_p95']:.3f}, 99% = {summary['util_flange_yield_p99']:.3f}")
+            counts, edges = np.histogram(samples['util_flange_yield'], bins=40)
+            st.bar_chart(pd.DataFrame({'samples': counts}, index=np.round((edges[:-1] + edges[1:]) / 2, 3)))
+
+    with profiling.span('K_buckling'):
+        K_c, lamda_kc_a, lamda_kc_b, fig2 = fnc.K_buckling(n_stif,a_panel,b_flange.value,t_f,f_y)
+    if fig2 is not None and st.checkbox("Show K_c curves", value=True):
+        st.image(fig2.png(), use_column_width=True)
+
+    with st.beta_expander("Previous designs"):
+        st.markdown("Filter the designs evaluated so far on their input and result columns (SI units)")
+        filters = []
+        for row in range(2):
+            filter_cols = st.beta_columns(3)
+            column = filter_cols[0].selectbox("Column", ("",) + results_store.INPUT_COLUMNS + results_store.RESULT_COLUMNS,
+                                              key=f"filter_column_{row}")
+            operator = filter_cols[1].selectbox("Operator", results_store.OPERATORS, key=f"filter_operator_{row}")
+            value = filter_cols[2].number_input("Value", value=0.0, format="%g", key=f"filter_value_{row}")
+            if column:
+                filters.append((column, operator, value))
+        table = store.query(filters=filters, limit=200)
+        st.write(f"{len(table)} of {store.count()} stored designs")
+        st.dataframe(table.drop(columns=['hash']))
+
+def performance_panel(profiler):
+    """Show the stage timings of this rerun in the sidebar"""
+    st.sidebar.markdown("## Performance")
+    totals = pd.Series(profiler.totals(), name="Time (s)").sort_values(ascending=False)
+    st.sidebar.table(totals.to_frame().style.format("{:.3f}"))
+    with st.sidebar.beta_expander("Stage details"):
+        st.table(pd.DataFrame(profiler.table()).fillna(""))
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    with profiling.record() as profiler:
+        main()
+    performance_panel(profiler)
\ No newline at end of file
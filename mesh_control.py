@@ -0,0 +1,98 @@
+"""
+Mesh density selection by convergence of the critical stresses.
+
+A design's section is meshed from coarse to fine (decreasing mesh_scale, the
+element edge length in plate thicknesses, see section_funcs.mesh_sizes) until
+the critical stresses used by the clause checks change by less than a relative
+tolerance between refinements. A refinement is only compared once the mesh
+has grown by MIN_GROWTH, so meshes held at the same density by the plate
+geometry do not pass as converged. The chosen mesh_scale and its element
+count are recorded per geometry in a JSON file so later runs reuse it without
+repeating the study.
+"""
+import json
+import os
+
+import engine
+import section_cache
+import section_funcs
+
+#Mesh scales tried from coarse to fine (2.0 is the coarsest mesh the plates allow)
+STUDY_SCALES = (2.0, 1.0, 0.5, 0.25)
+
+#Factor the element count must grow by before a refinement is compared
+MIN_GROWTH = 1.5
+
+#Critical stresses compared between refinements
+STUDY_RESULTS = ('f_star_s_fl', 'f_star_s_web', 'f_star_s_fl_mid', 'f_star_s_web_mid',
+                 'f_star_s_fl_mean', 'f_star_v', 'f_star_vt')
+
+DEFAULT_STORE = os.path.join(section_cache.DEFAULT_CACHE_DIR, 'mesh_choices.json')
+
+def _critical(design,loads,mesh_scale):
+    """Critical stresses and element count of a design meshed at mesh_scale"""
+    b, d, t_w, t_f, n_stif = design['b'], design['d'], design['t_w'], design['t_f'], design['n_stif']
+    section = section_funcs.boxsection(b,d,t_w,t_f,design['d_stif'],design['t_stif'],n_stif,mesh_scale,design['n_stif_web'])
+    section_funcs.analyse_section(section)
+    stresses = section_funcs.recover_stresses(section,loads['Fy'],loads['Fz'],loads['Mx'],loads['My'],loads['Mz'])
+    return engine.critical_stresses(section,[stresses],b,d,t_w,t_f,n_stif,design['n_stif_web']), len(section.mesh_elements)
+
+def convergence_study(design,loads=None,tol=0.01,scales=STUDY_SCALES,min_growth=MIN_GROWTH):
+    """
+    Refine the mesh through scales until every critical stress changes by less than tol.
+    Steps that do not grow the element count by min_growth over the last compared
+    mesh are skipped (recorded with a change of None).
+    Returns (chosen mesh_scale, its element count, list of (mesh_scale, elements,
+    max relative change) per step). If the study does not converge the finest
+    compared scale is returned.
+    """
+    design = {**engine.DESIGN_DEFAULTS, **design}
+    loads = {**engine.LOAD_DEFAULTS, **(loads or {})}
+    history = []
+    previous = None
+    for mesh_scale in scales:
+        crit, elements = _critical(design,loads,mesh_scale)
+        if previous is not None and elements < min_growth * previous[2]:
+            history.append((mesh_scale, elements, None)) #no real refinement
+            continue
+        change = None
+        if previous is not None:
+            change = max(abs(crit[key] - previous[0][key]) / max(abs(previous[0][key]), 1.0) for key in STUDY_RESULTS)
+        history.append((mesh_scale, elements, change))
+        if change is not None and change < tol:
+            return previous[1], previous[2], history #the coarser mesh was already converged
+        previous = (crit, mesh_scale, elements)
+    return previous[1], previous[2], history
+
+def _store_key(design,tol):
+    plates = [design[key] for key in ('b', 'd', 't_w', 't_f', 'd_stif', 't_stif', 'n_stif')]
+    return section_cache.section_key(*plates, n_stif_web=design['n_stif_web']) + '-' + repr(float(tol))
+
+def load_choices(path=DEFAULT_STORE):
+    """
+    Recorded choices keyed by geometry and tolerance, each a dict of the chosen
+    mesh_scale, its element count and the study history
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def select_mesh(design,loads=None,tol=0.01,scales=STUDY_SCALES,path=DEFAULT_STORE):
+    """
+    Return the design record with its mesh_scale set from the recorded choice
+    for its geometry, running and recording a convergence study if there is none.
+    """
+    design = {**engine.DESIGN_DEFAULTS, **design}
+    choices = load_choices(path)
+    key = _store_key(design,tol)
+    if key not in choices:
+        mesh_scale, elements, history = convergence_study(design,loads,tol,scales)
+        choices[key] = {'mesh_scale': mesh_scale, 'elements': elements, 'history': history}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({**load_choices(path), key: choices[key]}, f)
+        os.replace(tmp, path)
+    return {**design, 'mesh_scale': choices[key]['mesh_scale']}
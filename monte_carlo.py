@@ -0,0 +1,140 @@
+"""
+Monte Carlo study of material, fabrication and load variability.
+
+Samples the yield strength, the flange and web thicknesses, the pre-camber
+and the applied actions, and runs the flange yield (Cl 7.3.3.1) and K_c
+(Cl 7.3.3.2) checks on every sample without another mesh solve: the stresses
+are rebuilt from the unit-load fields of the nominal section (load_cases),
+with the thickness scatter applied as first-order scale factors on the
+actions taken from the analytic section properties.
+
+The pre-camber e acts with the axial force Fx (compression positive) as an
+additional vertical moment Fx * e / (1 - Fx / N_cr) about the major axis,
+with N_cr = pi^2 * E_s * ixx_c / L^2.
+"""
+import numpy as np
+import pandas as pd
+
+import analytic
+import engine
+import functions as fnc
+import load_cases
+import section_funcs
+
+#Coefficient of variation of each sampled input: f_y and the thicknesses are lognormal (so always
+#positive), the others normal.
+#The camber scatter is relative to the mean camber and the load scatter applies to each action.
+DEFAULT_SCATTER = {
+    'f_y': 0.07,
+    't_f': 0.03,
+    't_w': 0.03,
+    'camber': 0.5,
+    'loads': 0.10,
+}
+
+#Utilisation quantiles reported by summarise
+QUANTILES = (0.05, 0.5, 0.95, 0.99)
+
+def _lognormal(rng, cov, n):
+    """n lognormal samples of mean 1 and coefficient of variation cov"""
+    sigma = np.sqrt(np.log(1 + cov**2))
+    return rng.lognormal(-sigma**2 / 2, sigma, n)
+
+def sample_inputs(design, loads, n, scatter=None, camber=0.1, seed=0):
+    """
+    Draw n samples of f_y, t_f, t_w, camber and the actions Fx..Mz around the
+    nominal design and loads, with a fixed seed.
+    Returns a DataFrame with one row per sample.
+    """
+    scatter = {**DEFAULT_SCATTER, **(scatter or {})}
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for name in ('f_y', 't_f', 't_w'):
+        samples[name] = design[name] * _lognormal(rng, scatter[name], n)
+    samples['camber'] = camber * rng.normal(1, scatter['camber'], n)
+    for action in engine.LOAD_DEFAULTS:
+        samples[action] = loads[action] * rng.normal(1, scatter['loads'], n)
+    return pd.DataFrame(samples)
+
+def _plate_properties(design, t_f, t_w):
+    """Analytic section properties with the flange and web thicknesses replaced"""
+    plates = {**design, 't_f': t_f, 't_w': t_w}
+    plates = [plates[key] for key in ('b', 'd', 't_w', 't_f', 'd_stif', 't_stif', 'n_stif', 'n_stif_web')]
+    return analytic.section_properties(analytic.box_rectangles(*plates),*plates)
+
+def effective_actions(design, samples, L):
+    """
+    Actions on the nominal section giving the stresses of each sample.
+    Bending moments are scaled by the nominal over sampled second moment of area,
+    the vertical shear by the web thickness ratio and torsion by the ratio of the
+    thinner plate (Bredt), each to first order in the thickness changes.
+    The camber moment is added to Mz before scaling.
+    """
+    t_f, t_w = design['t_f'], design['t_w']
+    nominal = _plate_properties(design, t_f, t_w)
+    d_tf = _plate_properties(design, t_f * 1.01, t_w)
+    d_tw = _plate_properties(design, t_f, t_w * 1.01)
+    dt_f = samples['t_f'].to_numpy() / t_f - 1
+    dt_w = samples['t_w'].to_numpy() / t_w - 1
+    props = {key: nominal[key] + (d_tf[key] - nominal[key]) / 0.01 * dt_f + (d_tw[key] - nominal[key]) / 0.01 * dt_w
+             for key in ('ixx_c', 'iyy_c')}
+
+    Fx = samples['Fx'].to_numpy()
+    N_cr = np.pi**2 * design['E_s'] * props['ixx_c'] / L**2
+    M_camber = Fx * samples['camber'].to_numpy() / (1 - np.clip(Fx / N_cr, None, 0.99))
+
+    t_min = min(t_f, t_w)
+    actions = pd.DataFrame({
+        'Fx': Fx,
+        'Fy': samples['Fy'].to_numpy() * t_w / samples['t_w'].to_numpy(),
+        'Fz': samples['Fz'].to_numpy(),
+        'Mx': samples['Mx'].to_numpy() * t_min / np.minimum(samples['t_f'], samples['t_w']).to_numpy(),
+        'My': samples['My'].to_numpy() * nominal['iyy_c'] / props['iyy_c'],
+        'Mz': (samples['Mz'].to_numpy() + M_camber) * nominal['ixx_c'] / props['ixx_c'],
+    })
+    return actions
+
+def monte_carlo(design, loads=None, n=20000, scatter=None, camber=0.1, L=50.0, seed=0, design_engine=None, section=None):
+    """
+    Run the Monte Carlo study of a design.
+    n: number of samples
+    scatter: coefficients of variation overriding DEFAULT_SCATTER
+    camber: mean pre-camber (m), L: girder length (m) for the camber amplification
+    section: the design's analysed SectionData, if already at hand
+    Returns a DataFrame with the sampled inputs and, per sample, the critical
+    stresses, util_flange_yield, flange_yield_pass and K_c.
+    """
+    design = {**engine.DESIGN_DEFAULTS, **design}
+    loads = {**engine.LOAD_DEFAULTS, **(loads or {})}
+    if section is None:
+        section = (design_engine or engine.DesignEngine()).section(design)
+    samples = sample_inputs(design, loads, n, scatter, camber, seed)
+
+    cases = effective_actions(design, samples, L)
+    cases['case'] = samples.index
+    results = load_cases.case_stresses(section,section.unit,design,cases)
+    results = pd.concat([samples, results.drop(columns=['case', 'util_flange_yield'])], axis=1)
+
+    results['util_flange_yield'] = results['f_star_comb'] / (design['phi'] * results['f_y'])
+    results['flange_yield_pass'] = results['util_flange_yield'] <= 1.0
+    b_flange, b_web = fnc.longit_stif_spacing.value(design['b'],design['d'],design['n_stif'],
+                                                    section_funcs.web_stiffeners(design['n_stif'],design['n_stif_web']))
+    results['K_c'] = fnc.K_value(design['n_stif'],design['a_panel'],b_flange,results['t_f'].to_numpy(),results['f_y'].to_numpy())[0]
+    return results
+
+def summarise(results):
+    """
+    Utilisation distribution and failure probability of a monte_carlo run.
+    Returns a dict of the mean, standard deviation and QUANTILES of
+    util_flange_yield and K_c, the probability of failure and its standard error.
+    """
+    util = results['util_flange_yield'].to_numpy()
+    p_f = float((util > 1.0).mean())
+    summary = {'samples': len(util), 'p_failure': p_f, 'p_failure_se': float(np.sqrt(p_f * (1 - p_f) / len(util)))}
+    for name in ('util_flange_yield', 'K_c'):
+        values = results[name].to_numpy()
+        summary[f'{name}_mean'] = float(values.mean())
+        summary[f'{name}_std'] = float(values.std())
+        for q in QUANTILES:
+            summary[f'{name}_p{q*100:g}'] = float(np.quantile(values, q))
+    return summary
@@ -0,0 +1,92 @@
+"""
+Uniform grid index over the mesh nodes of a CrossSection.
+
+Built once per mesh, it answers the rectangular region queries of
+section_funcs.stress_location for many regions and many load cases in a
+single vectorised call instead of looping over every node in Python.
+"""
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+_section_indexes = WeakKeyDictionary()
+
+class NodeIndex:
+    """
+    Bucket the nodes into a uniform grid of cells so a region query only
+    tests the nodes in the cells overlapping the region.
+    nodes_xy: (n_nodes, 2) array of node coordinates
+    nodes_per_cell: average number of nodes per grid cell
+    """
+    def __init__(self, nodes_xy, nodes_per_cell=8):
+        self.nodes_xy = np.asarray(nodes_xy, dtype=float)
+        x = self.nodes_xy[:,0]
+        y = self.nodes_xy[:,1]
+        self.x0, self.y0 = x.min(), y.min()
+        width = max(x.max() - self.x0, 1e-12)
+        height = max(y.max() - self.y0, 1e-12)
+        n_cells = max(len(x) / nodes_per_cell, 1)
+        self.cell = np.sqrt(width * height / n_cells)
+        self.nx = int(width // self.cell) + 1
+        self.ny = int(height // self.cell) + 1
+
+        cell_ids = self._cell_x(x) + self.nx * self._cell_y(y)
+        self.order = np.argsort(cell_ids, kind='stable')
+        counts = np.bincount(cell_ids, minlength=self.nx * self.ny)
+        self.cell_start = np.concatenate(([0], np.cumsum(counts)))
+        self._regions = {}
+
+    def _cell_x(self, x):
+        return np.clip(((np.asarray(x) - self.x0) // self.cell).astype(int), 0, self.nx - 1)
+
+    def _cell_y(self, y):
+        return np.clip(((np.asarray(y) - self.y0) // self.cell).astype(int), 0, self.ny - 1)
+
+    def query(self, x_c, y_c, tol_x, tol_y):
+        """Node ids within the box x_c +/- tol_x, y_c +/- tol_y (inclusive)"""
+        key = (x_c, y_c, tol_x, tol_y)
+        if key in self._regions:
+            return self._regions[key]
+        ix0, ix1 = self._cell_x(x_c - tol_x), self._cell_x(x_c + tol_x)
+        iy0, iy1 = self._cell_y(y_c - tol_y), self._cell_y(y_c + tol_y)
+        rows = [self.order[self.cell_start[iy * self.nx + ix0]:self.cell_start[iy * self.nx + ix1 + 1]]
+                for iy in range(iy0, iy1 + 1)]
+        candidates = np.sort(np.concatenate(rows))
+        x = self.nodes_xy[candidates,0]
+        y = self.nodes_xy[candidates,1]
+        inside = (x_c - tol_x <= x) & (x <= x_c + tol_x) & (y_c - tol_y <= y) & (y <= y_c + tol_y)
+        self._regions[key] = candidates[inside]
+        return self._regions[key]
+
+    def aggregate(self, stresses, boxes):
+        """
+        Reduce a stress field over several regions in one call.
+        stresses: (n_nodes,) or (n_cases, n_nodes) array of nodal stresses
+        boxes: sequence of (x, y, tol_x, tol_y, result_type) with result_type
+        'max', 'min' or 'mean', as per section_funcs.stress_location
+        Returns the absolute results as an array of shape (n_boxes,) or (n_cases, n_boxes).
+        """
+        stresses = np.asarray(stresses)
+        ids = [self.query(*box[:4]) for box in boxes]
+        sizes = np.array([len(region) for region in ids])
+        if (sizes == 0).any():
+            raise ValueError("No mesh nodes within region {0}".format(boxes[int(np.argmin(sizes))][:4]))
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        gathered = stresses[...,np.concatenate(ids)]
+
+        results = np.empty(stresses.shape[:-1] + (len(boxes),))
+        result_types = np.array([box[4] for box in boxes])
+        for result_type, reduce in (('max', np.maximum), ('min', np.minimum), ('mean', np.add)):
+            selected = result_types == result_type
+            if selected.any():
+                reduced = reduce.reduceat(gathered, starts, axis=-1)[...,selected]
+                if result_type == 'mean':
+                    reduced = reduced / sizes[selected]
+                results[...,selected] = reduced
+        return np.abs(results)
+
+def section_index(section):
+    """Return the NodeIndex of a CrossSection's mesh, building it on first use"""
+    if section not in _section_indexes:
+        _section_indexes[section] = NodeIndex(section.mesh_nodes)
+    return _section_indexes[section]
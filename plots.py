@@ -0,0 +1,73 @@
+"""
+Lazily drawn figures for the interactive report.
+
+Plotting functions are wrapped in LazyFigure objects, which only draw the
+figure when it is shown. Rendered PNG images are cached by a key hashed from
+the design and load values the figure depends on, so an unchanged figure is
+never redrawn on later reruns or in other reports.
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+
+import profiling
+
+#Number of rendered images kept in memory
+MAX_IMAGES = 64
+
+_images = OrderedDict()
+_lock = threading.Lock()
+
+def figure_key(name, **values):
+    """Cache key of a figure from its name and the values it is drawn from"""
+    text = json.dumps([name, sorted((key, repr(value)) for key, value in values.items())])
+    return hashlib.sha1(text.encode()).hexdigest()
+
+class LazyFigure:
+    """
+    A matplotlib figure that is only drawn when needed.
+    key: cache key of the rendered image (see figure_key), or None to not cache it
+    draw: function drawing the figure and returning (fig, ax)
+    """
+    def __init__(self, key, draw):
+        self.key = key
+        self.draw = draw
+        self._figure = None
+
+    def figure(self):
+        """The drawn (fig, ax), drawing it on the first call"""
+        if self._figure is None:
+            with profiling.span('plot', key=self.key):
+                self._figure = self.draw()
+        return self._figure
+
+    def png(self, dpi=100):
+        """The figure as PNG bytes, rendered on the first call for its key"""
+        key = None if self.key is None else (self.key, dpi)
+        with _lock:
+            if key in _images:
+                _images.move_to_end(key)
+                return _images[key]
+
+        import matplotlib.pyplot as plt
+        fig, ax = self.figure()
+        buffer = io.BytesIO()
+        with profiling.span('render', key=self.key):
+            fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+        self._figure = None
+        image = buffer.getvalue()
+
+        if key is not None:
+            with _lock:
+                _images[key] = image
+                while len(_images) > MAX_IMAGES:
+                    _images.popitem(last=False)
+        return image
+
+def clear_images():
+    """Empty the rendered image cache"""
+    with _lock:
+        _images.clear()
@@ -0,0 +1,112 @@
+"""
+Lightweight stage timing for the calculation chain.
+
+The calculation stages are wrapped in span(name, **info), which does nothing
+unless a Profiler is active:
+
+    with profiling.record() as prof:
+        engine.DesignEngine().evaluate(design, loads)
+    prof.to_chrome_trace('trace.json')  # open in chrome://tracing or Perfetto
+
+Each span records its start, duration, nesting depth and any info passed
+(e.g. node and element counts), plus the change in traced Python memory when
+recording with memory=True.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_active = ContextVar('profiler', default=None)
+
+class Profiler:
+    """Collects the spans recorded while it is active"""
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.spans = []
+        self.depth = 0
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **info):
+        record = {'name': name, 'depth': self.depth, 'start': time.perf_counter() - self.origin, **info}
+        if self.memory:
+            mem_start = tracemalloc.get_traced_memory()[0]
+        self.depth += 1
+        try:
+            yield record
+        finally:
+            self.depth -= 1
+            record['duration'] = time.perf_counter() - self.origin - record['start']
+            if self.memory:
+                record['mem_delta'] = tracemalloc.get_traced_memory()[0] - mem_start
+            self.spans.append(record)
+
+    def merge(self, other):
+        """
+        Add the spans of another Profiler, e.g. one recording a job on another
+        thread, nested at the current depth and on this profiler's clock.
+        """
+        offset = other.origin - self.origin
+        self.spans.extend({**record, 'start': record['start'] + offset, 'depth': record['depth'] + self.depth}
+                          for record in other.spans)
+
+    def table(self):
+        """Spans in start order, for display as a table"""
+        return sorted(self.spans, key=lambda record: record['start'])
+
+    def totals(self):
+        """Total duration of each stage name, in seconds"""
+        totals = {}
+        for record in self.spans:
+            totals[record['name']] = totals.get(record['name'], 0.0) + record['duration']
+        return totals
+
+    def to_json(self, path):
+        """Write the spans to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.table(), f, indent=1, default=float)
+
+    def to_chrome_trace(self, path):
+        """Write the spans in Chrome trace event format"""
+        pid, tid = os.getpid(), threading.get_ident()
+        events = [{'name': record['name'], 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': record['start'] * 1e6, 'dur': record['duration'] * 1e6,
+                   'args': {key: value for key, value in record.items() if key not in ('name', 'start', 'duration')}}
+                  for record in self.table()]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=float)
+
+@contextmanager
+def record(memory=False):
+    """Activate a new Profiler for the enclosed block and return it"""
+    profiler = Profiler(memory)
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    token = _active.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active.reset(token)
+        if started:
+            tracemalloc.stop()
+
+def merge(profiler):
+    """Merge the spans of profiler into the active Profiler, if any"""
+    active = _active.get()
+    if active is not None and profiler is not None:
+        active.merge(profiler)
+
+@contextmanager
+def span(name, **info):
+    """Time the enclosed block as a stage of the active Profiler, if any"""
+    profiler = _active.get()
+    if profiler is None:
+        yield info
+    else:
+        with profiler.span(name, **info) as record:
+            yield record
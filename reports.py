@@ -0,0 +1,285 @@
+"""
+Bulk calculation reports for a list of designs.
+
+Writes one HTML calculation package per design and an index of all of them.
+Designs are grouped by section geometry and each group runs on a worker
+process, so a section is meshed and analysed once however many designs share
+it. Figures are written once to a shared figures directory, named by their
+plots.figure_key, and the handcalcs LaTeX fragments are cached per worker by
+the values they are rendered from, so designs with identical sections reuse
+them. The page templates are compiled once at import.
+
+Input rows are as per batch.py (keys of engine.DESIGN_DEFAULTS and
+engine.LOAD_DEFAULTS, SI units), with an optional 'name' column:
+
+    python reports.py designs.csv reports/ --processes 8
+
+The reports use MathJax for the equations and can be printed to PDF from a browser.
+"""
+import argparse
+import html
+import os
+import re
+import string
+
+import pandas as pd
+
+import batch
+import engine
+import functions as fnc
+import plots
+import section_cache
+import section_funcs
+import utilisation
+
+#Page templates, compiled once
+REPORT_TEMPLATE = string.Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>$name - Box girder stiffener calculations</title>
+<script src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js" async></script>
+<style>$style</style>
+</head>
+<body>
+<h1>$name</h1>
+<p>Box Girder Design - Stiffener calculations to AS5100.6</p>
+<h2>Inputs</h2>
+$inputs
+<h2>Longitudinal stiffener spacing</h2>
+$spacing_latex
+<h2>Section</h2>
+<img src="$section_figure" alt="Cross section">
+$properties
+<h2>Critical stresses</h2>
+$stresses
+<h2>Cl 7.3.3.1 - Yielding of flange plate</h2>
+$flange_yield_latex
+<p class="$flange_yield_class">$flange_yield_status</p>
+<p>Governing element: $governing_element, Util = $governing_util</p>
+<h2>Cl 7.3.3.2 - Effective section of flange stiffener</h2>
+$k_buckling
+<img src="$k_figure" alt="K_c curves">
+</body>
+</html>
+""")
+
+INDEX_TEMPLATE = string.Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Box girder calculation reports</title>
+<style>$style</style>
+</head>
+<body>
+<h1>Box girder calculation reports</h1>
+<p>$count designs, $failures failing</p>
+$table
+</body>
+</html>
+""")
+
+STYLE = """
+body { font-family: sans-serif; max-width: 50em; margin: 2em auto; }
+table { border-collapse: collapse; margin: 1em 0; }
+td, th { border: 1px solid #ccc; padding: 0.2em 0.6em; text-align: right; }
+img { max-width: 100%; }
+.pass { color: #080; font-weight: bold; }
+.fail { color: #c00; font-weight: bold; }
+"""
+
+#Summary fields of each design in the index
+INDEX_COLUMNS = ('name', 'b', 'd', 't_f', 't_w', 'n_stif', 'n_stif_web', 'area',
+                 'util_flange_yield', 'flange_yield_pass', 'K_c', 'governing_element', 'error')
+
+#Section properties and critical stresses listed in each report
+PROPERTIES = ('area', 'cx', 'cy', 'ixx_c', 'iyy_c', 'j')
+STRESSES = ('f_star_s_comp', 'f_star_s_tens', 'f_star_s_fl', 'f_star_s_web', 'f_star_s_fl_mid',
+            'f_star_s_web_mid', 'f_star_s_fl_mean', 'f_star_v', 'f_star_vt')
+
+#LaTeX fragments cached in each worker process, keyed by plots.figure_key
+_fragments = {}
+
+def _fragment(key, render):
+    """LaTeX fragment for key, rendering it on the first request in this process"""
+    if key not in _fragments:
+        _fragments[key] = render()
+    return _fragments[key]
+
+def _latex(latex):
+    return f'<div class="math">{html.escape(latex)}</div>'
+
+def _table(values, fmt='{}'):
+    """HTML table of a dict of name: value, one row each, with values formatted by fmt"""
+    rows = ''.join(f'<tr><th>{html.escape(str(name))}</th><td>{html.escape(fmt.format(value))}</td></tr>'
+                   for name, value in values.items())
+    return f'<table>{rows}</table>'
+
+def section_figure(design):
+    """Plot the box plates and stiffeners with the critical stress locations, returning the figure and axes"""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
+
+    plates = [design[key] for key in ('b', 'd', 't_w', 't_f', 'd_stif', 't_stif', 'n_stif', 'n_stif_web')]
+    fig, ax = plt.subplots()
+    ax.set_aspect('equal')
+    for x0, y0, x1, y1 in section_funcs.box_plates(*plates):
+        ax.add_patch(Rectangle((x0, y0), x1 - x0, y1 - y0, facecolor='lightgrey', edgecolor='k', linewidth=0.5))
+    boxes = engine.critical_boxes(*[design[key] for key in ('b', 'd', 't_w', 't_f', 'n_stif', 'n_stif_web')])
+    for name in ('f_star_s_fl', 'f_star_s_web', 'f_star_s_fl_mid', 'f_star_s_web_mid'):
+        x, y = boxes[name][:2]
+        ax.plot(x, y, 'ro')
+        ax.annotate(name, (x, y), (x + 0.05 * design['b'], y - 0.08 * design['d']), fontsize=8)
+    ax.autoscale_view()
+    return fig, ax
+
+def _write_figure(root, figure):
+    """Write a LazyFigure to the figures directory once, returning its path relative to root"""
+    path = os.path.join('figures', figure.key + '.png')
+    if not os.path.exists(os.path.join(root, path)):
+        tmp = os.path.join(root, path + f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(figure.png())
+        os.replace(tmp, os.path.join(root, path))
+    return path
+
+def report_files(names):
+    """
+    HTML file names of the reports of a list of design names: characters other than
+    letters, digits, '.', '_' and '-' become '_', and repeated names get a -2, -3... suffix
+    """
+    files = []
+    used = {'index'}
+    for name in names:
+        stem = re.sub(r'[^A-Za-z0-9._-]', '_', name).strip('.') or 'design'
+        unique = stem
+        count = 1
+        while unique.lower() in used:
+            count += 1
+            unique = f'{stem}-{count}'
+        used.add(unique.lower()) #case-insensitive file systems
+        files.append(unique + '.html')
+    return files
+
+def design_report(root, name, design, loads, section, file=None):
+    """
+    Write the HTML report of one design to root/file.
+    section: the design's SectionData, as per engine.build_section
+    file: report file name (as per report_files if None)
+    Returns the index row of the design.
+    """
+    import forallpeople as u
+    u.environment('structural')
+
+    result = engine.check_design(design,loads,section)
+    elements = utilisation.element_utilisation(section,design,loads)
+    gov = utilisation.governing(elements)
+    n_stif_web = section_funcs.web_stiffeners(design['n_stif'],design['n_stif_web'])
+    design = {**design, 'n_stif_web': n_stif_web}
+
+    spacing_key = plots.figure_key('longit_stif_spacing', b=design['b'], d=design['d'],
+                                   n_stif=design['n_stif'], n_stif_web=n_stif_web)
+    spacing_latex = _fragment(spacing_key, lambda: fnc.longit_stif_spacing(design['b'] * u.m,design['d'] * u.m,
+                                                                           design['n_stif'],n_stif_web)[0])
+    stresses = (result['f_star_vt'], result['f_star_v'], result['f_star_s_fl_mid'])
+    yield_key = plots.figure_key('flange_yield', stresses=stresses)
+    yield_latex = _fragment(yield_key, lambda: fnc.flange_yield(*[stress * u.Pa for stress in stresses])[0])
+
+    section_key = plots.figure_key('report_section', **{key: design[key] for key in engine.GEOMETRY_KEYS if key != 'mesh_scale'})
+    section_path = _write_figure(root, plots.LazyFigure(section_key, lambda: section_figure(design)))
+    K = fnc.K_value(design['n_stif'],design['a_panel'],result['b_flange'],design['t_f'],design['f_y'])
+    k_key = plots.figure_key('K_buckling', n_stif=design['n_stif'], a_panel=design['a_panel'],
+                             b_panel=result['b_flange'], t=design['t_f'], f_y=design['f_y'])
+    k_path = _write_figure(root, plots.LazyFigure(k_key, lambda: fnc.plot_K_buckling(K[0],K[1],K[3],K[4],K[5])))
+
+    util = result['util_flange_yield']
+    page = REPORT_TEMPLATE.substitute(
+        name=html.escape(name),
+        style=STYLE,
+        inputs=_table({**design, **loads}),
+        spacing_latex=_latex(spacing_latex),
+        section_figure=section_path,
+        properties=_table({key: result[key] for key in PROPERTIES}, '{:.5g}'),
+        stresses=_table({key: result[key] / 1e6 for key in STRESSES}, '{:.1f} MPa'),
+        flange_yield_latex=_latex(yield_latex),
+        flange_yield_class='pass' if result['flange_yield_pass'] else 'fail',
+        flange_yield_status=f"{'PASS' if result['flange_yield_pass'] else 'FAIL'} Util = {util:.2f}",
+        governing_element=html.escape(gov['element']),
+        governing_util=f"{gov['util']:.2f}",
+        k_buckling=_table({'lamda_kc_b (Crv 1/2)': K[5], 'lamda_kc_a (Crv 3)': K[4],
+                           'K_cv1': K[1], 'K_cv2': K[2], 'K_cv3': K[3], 'K_c': K[0]}, '{:.3f}'),
+        k_figure=k_path,
+    )
+    with open(os.path.join(root, file or report_files([name])[0]), 'w') as f:
+        f.write(page)
+    return {**design, **result, 'name': name, 'governing_element': gov['element']}
+
+def _report_group(args):
+    """Worker: analyse one section and write the report of every design sharing it"""
+    root, jobs, cache_args = args
+    rows = []
+    try:
+        section = engine.build_section(jobs[0][1], cache_args and section_cache.SectionCache(*cache_args))
+    except Exception as error:
+        return [(index, {'name': name, 'error': repr(error)}) for index, design, loads, name, file in jobs]
+    for index, design, loads, name, file in jobs:
+        try:
+            rows.append((index, design_report(root, name, design, loads, section, file)))
+        except Exception as error:
+            rows.append((index, {'name': name, 'error': repr(error)}))
+    return rows
+
+def write_reports(records, root, processes=None, cache=None, progress=print):
+    """
+    Write the report of every (name, design, loads) record to the root directory,
+    and an index.html linking them.
+    processes: number of worker processes (None = one per core, 1 = in this process)
+    cache: optional section_cache.SectionCache shared by the workers
+    Returns the index as a DataFrame, one row per record in input order.
+    """
+    os.makedirs(os.path.join(root, 'figures'), exist_ok=True)
+    files = report_files([name for name, design, loads in records])
+    groups = engine.group_by_geometry((index, {**engine.DESIGN_DEFAULTS, **design}, {**engine.LOAD_DEFAULTS, **(loads or {})}, name, file)
+                                      for index, ((name, design, loads), file) in enumerate(zip(records, files)))
+
+    cache_args = (cache.root, cache.max_bytes) if cache is not None else None
+    tasks = [(root, jobs, cache_args) for jobs in groups]
+    rows = [None] * len(records)
+    done = 0
+    for group in engine.map_groups(_report_group, tasks, processes):
+        for index, row in group:
+            rows[index] = row
+        done += len(group)
+        progress(f"{done} of {len(records)} reports written")
+
+    index = pd.DataFrame(rows).reindex(columns=INDEX_COLUMNS)
+    #Designs that failed have no report to link to
+    links = index.assign(name=[html.escape(name) if pd.notna(error) else f'<a href="{html.escape(file)}">{html.escape(name)}</a>'
+                               for name, error, file in zip(index['name'], index['error'], files)])
+    with open(os.path.join(root, 'index.html'), 'w') as f:
+        f.write(INDEX_TEMPLATE.substitute(style=STYLE, count=len(index), failures=int((index['flange_yield_pass'] == False).sum()),
+                                          table=links.to_html(index=False, escape=False, na_rep='')))
+    return index
+
+def read_records(path):
+    """(name, design, loads) records of a CSV or Parquet file of design and load rows"""
+    table = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+    records = []
+    for number, row in enumerate(table.to_dict('records')):
+        design, loads = batch.parse_row(row)
+        name = str(row['name']) if not pd.isna(row.get('name')) else f'design-{number+1:04d}'
+        records.append((name, design, loads))
+    return records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write HTML calculation reports for a table of designs")
+    parser.add_argument('input', help="CSV or Parquet file of design and load rows, with an optional name column")
+    parser.add_argument('output', help="directory the reports are written to")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default one per core)")
+    parser.add_argument('--cache-dir', default=None, help="directory of the persistent section cache")
+    args = parser.parse_args(argv)
+    write_reports(read_records(args.input), args.output, args.processes,
+                  section_cache.SectionCache(args.cache_dir) if args.cache_dir else None)
+
+if __name__ == '__main__':
+    main()
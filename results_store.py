@@ -0,0 +1,170 @@
+"""
+Local SQLite store of evaluated designs.
+
+Every evaluated design is written as one row holding its design and load
+inputs, a hash of them, the section properties, critical stresses, K_c and
+the pass/fail checks. The input and result columns are indexed so past
+results can be queried and reloaded instantly, e.g.
+
+    store = ResultsStore()
+    store.query(filters=[('util_flange_yield', '<', 0.9)], t_f=0.012)
+
+and an engine.DesignEngine given a store skips designs it already holds.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import engine
+import section_cache
+import section_funcs
+
+#Bump when the checks change, so results of older versions are no longer reused
+RESULTS_VERSION = 1
+
+DEFAULT_STORE_PATH = os.environ.get('BOX_GIRDER_RESULTS', os.path.join(section_cache.DEFAULT_CACHE_DIR, 'results.sqlite'))
+
+#Result fields stored as their own columns (the whole record is also kept as JSON)
+RESULT_COLUMNS = ('b_flange', 'b_web', 'area', 'cx', 'cy', 'ixx_c', 'iyy_c', 'ixy_c', 'j',
+                  'f_star_s_comp', 'f_star_s_tens', 'f_star_s_fl', 'f_star_s_web', 'f_star_s_fl_mid',
+                  'f_star_s_web_mid', 'f_star_s_fl_mean', 'f_star_v', 'f_star_vt', 'f_star_comb',
+                  'util_flange_yield', 'flange_yield_pass', 'K_c', 'lamda_kc_a', 'lamda_kc_b')
+
+INPUT_COLUMNS = tuple(engine.DESIGN_DEFAULTS) + tuple(engine.LOAD_DEFAULTS)
+COLUMNS = ('hash', 'created', 'method') + INPUT_COLUMNS + RESULT_COLUMNS
+
+#Columns stored as integers, the others being floats
+INTEGER_COLUMNS = ('n_stif', 'n_stif_web', 'flange_yield_pass')
+
+#Columns indexed for queries
+INDEXED = ('created', 'b, d', 't_f', 't_w', 'n_stif', 'util_flange_yield', 'flange_yield_pass', 'K_c')
+
+#Comparisons allowed in query filters
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=')
+
+#Rows looked up per statement (below SQLite's bound parameter limit)
+_LOOKUP_CHUNK = 500
+
+def _plain(value):
+    """Python float, int or bool of a NumPy or Python scalar"""
+    return value.item() if hasattr(value, 'item') else value
+
+def inputs(design, loads):
+    """Full design and load record with defaults filled in and n_stif_web resolved"""
+    record = {**engine.DESIGN_DEFAULTS, **engine.LOAD_DEFAULTS, **design, **(loads or {})}
+    record['n_stif'] = int(record['n_stif'])
+    record['n_stif_web'] = section_funcs.web_stiffeners(record['n_stif'],record['n_stif_web'])
+    return {key: _plain(record[key]) for key in INPUT_COLUMNS}
+
+def design_hash(design, loads, method='fe'):
+    """Content hash of the design and load inputs and the analysis method"""
+    record = inputs(design, loads)
+    text = json.dumps([RESULTS_VERSION, section_cache.CACHE_VERSION, method] +
+                      [repr(float(record[key])) for key in INPUT_COLUMNS])
+    return hashlib.sha1(text.encode()).hexdigest()
+
+class ResultsStore:
+    """
+    SQLite file of evaluated designs, one row per design, loads and method.
+    path: database file (created with its directory if missing)
+    Connections are opened per call, so a store may be shared between threads.
+    """
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        columns = ', '.join(['hash TEXT PRIMARY KEY', 'created REAL', 'method TEXT'] +
+                            [f'{column} {"INTEGER" if column in INTEGER_COLUMNS else "REAL"}' for column in INPUT_COLUMNS + RESULT_COLUMNS] + ['result TEXT'])
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL') #readers do not block the writer
+            db.execute(f'CREATE TABLE IF NOT EXISTS results ({columns})')
+            for index in INDEXED:
+                name = 'idx_' + index.replace(', ', '_')
+                db.execute(f'CREATE INDEX IF NOT EXISTS {name} ON results ({index})')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, design, loads=None, method='fe'):
+        """Stored result record of a design, or None if it has not been evaluated"""
+        return self.get_many([(design, loads)], method)[0]
+
+    def get_many(self, records, method='fe'):
+        """Stored result records of a list of (design, loads), with None for those not stored"""
+        hashes = [design_hash(design, loads, method) for design, loads in records]
+        found = {}
+        with self._connect() as db:
+            for start in range(0, len(hashes), _LOOKUP_CHUNK):
+                chunk = hashes[start:start + _LOOKUP_CHUNK]
+                rows = db.execute(f'SELECT hash, result FROM results WHERE hash IN ({", ".join("?" * len(chunk))})', chunk)
+                found.update((key, json.loads(result)) for key, result in rows)
+        return [found.get(key) for key in hashes]
+
+    def put(self, design, loads, result, method='fe'):
+        """Store the result record of a design"""
+        self.put_many([(design, loads, result)], method)
+
+    def put_many(self, records, method='fe'):
+        """Store a list of (design, loads, result record); failed records with an 'error' are skipped"""
+        rows = []
+        for design, loads, result in records:
+            if result is None or result.get('error') is not None:
+                continue
+            result = {key: _plain(value) for key, value in result.items() if key != 'error'}
+            record = inputs(design, loads)
+            rows.append([design_hash(design, loads, method), time.time(), method] +
+                        [record[key] for key in INPUT_COLUMNS] +
+                        [result.get(key) for key in RESULT_COLUMNS] + [json.dumps(result)])
+        with self._connect() as db:
+            db.executemany(f'INSERT OR REPLACE INTO results ({", ".join(COLUMNS)}, result) '
+                           f'VALUES ({", ".join("?" * (len(COLUMNS) + 1))})', rows)
+
+    def query(self, filters=(), limit=None, **equals):
+        """
+        Stored results as a DataFrame, newest first.
+        filters: (column, operator, value) conditions, with operators from OPERATORS,
+        e.g. [('util_flange_yield', '<', 0.9)]
+        equals: column=value conditions, e.g. t_f=0.012, method='fe'
+        Raises a ValueError for an unknown column or operator.
+        """
+        filters = list(filters) + [(column, '=', value) for column, value in equals.items()]
+        conditions = []
+        params = []
+        for column, operator, value in filters:
+            if column not in COLUMNS:
+                raise ValueError(f"Unknown results column: {column}")
+            if operator not in OPERATORS:
+                raise ValueError(f"Unknown operator: {operator}")
+            conditions.append(f'{column} {operator} ?')
+            params.append(value)
+        sql = f'SELECT {", ".join(COLUMNS)} FROM results'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY created DESC'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        with self._connect() as db:
+            table = pd.read_sql_query(sql, db, params=params)
+        table['flange_yield_pass'] = table['flange_yield_pass'].astype('boolean')
+        return table
+
+    def count(self):
+        """Number of stored results"""
+        with self._connect() as db:
+            return db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def clear(self):
+        """Remove every stored result"""
+        with self._connect() as db:
+            db.execute('DELETE FROM results')
@@ -0,0 +1,197 @@
+"""
+Persistent on-disk cache of analysed box girder sections.
+
+Entries are content addressed by the geometry inputs of boxgenerator and the
+mesh sizes, and hold the mesh, section properties and unit-action stress
+fields of a section_funcs.SectionData. Arrays are stored as .npy files so they
+are memory-mapped on load rather than read into every process.
+Least recently used entries are evicted once the cache exceeds max_bytes.
+
+SharedSections keeps a process-wide, memory-capped set of these memory-mapped
+sections for the interactive app, so every session and thread uses one copy,
+and the OS page cache shares it with every other process reading the same
+cache directory (worker pools, sweeps, reports). Pointing BOX_GIRDER_CACHE at
+a tmpfs such as /dev/shm keeps the whole cache in shared memory.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import section_funcs
+
+#Bump when the stored data or the analysis changes, to invalidate old entries
+CACHE_VERSION = 4
+
+DEFAULT_CACHE_DIR = os.environ.get('BOX_GIRDER_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'stiffened_box_girder'))
+
+#Array bytes held by the process-wide SharedSections before it evicts
+SHARED_MAX_BYTES = int(os.environ.get('BOX_GIRDER_SHARED_BYTES', 512 * 1024**2))
+
+def section_key(b,d,t_w,t_f,d_stif,t_stif,n_stif,mesh_scale=1.0,n_stif_web=None):
+    """Content hash of the inputs that define a meshed and analysed section"""
+    inputs = [CACHE_VERSION, b, d, t_w, t_f, d_stif, t_stif, int(n_stif),
+              section_funcs.web_stiffeners(n_stif,n_stif_web), *section_funcs.mesh_sizes(t_w,t_f,t_stif,mesh_scale)]
+    text = json.dumps([repr(float(value)) for value in inputs])
+    return hashlib.sha1(text.encode()).hexdigest()
+
+class SectionCache:
+    """
+    Directory of cached SectionData entries, one sub-directory per key.
+    root: cache directory (created if missing)
+    max_bytes: total size above which least recently used entries are removed
+    dtype: dtype of the unit stress fields of the sections it analyses
+    """
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=2 * 1024**3, dtype=np.float64):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """Return the memory-mapped SectionData for key, or None if not cached"""
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, 'props.json')) as f:
+                props = json.load(f)
+            load = lambda name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+            data = section_funcs.SectionData(load('mesh_nodes'), load('mesh_elements'), props,
+                                             {name: load(name) for name in section_funcs.UNIT_FIELDS})
+        except (OSError, ValueError):
+            return None
+        os.utime(path) #mark as recently used
+        return data
+
+    def put(self, key, data):
+        """Store a SectionData under key and evict old entries if over the size limit"""
+        tmp = tempfile.mkdtemp(dir=self.root, prefix='.tmp-')
+        np.save(os.path.join(tmp, 'mesh_nodes.npy'), np.asarray(data.mesh_nodes, dtype=np.float64))
+        np.save(os.path.join(tmp, 'mesh_elements.npy'), np.asarray(data.mesh_elements, dtype=np.int32))
+        for component, field in data.unit.items():
+            np.save(os.path.join(tmp, component + '.npy'), np.asarray(field))
+        with open(os.path.join(tmp, 'props.json'), 'w') as f:
+            json.dump(data.props, f)
+        try:
+            os.rename(tmp, self._path(key))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True) #another process stored it first
+        self.evict()
+
+    def entries(self):
+        """List of (last used time, size in bytes, path) of every entry"""
+        entries = []
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+            except OSError:
+                pass
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache is within max_bytes"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Remove every entry"""
+        for _, _, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def key(self, b,d,t_w,t_f,d_stif,t_stif,n_stif,mesh_scale=1.0,n_stif_web=None):
+        """Entry key of a geometry, as per section_key and tagged with the dtype if not float64"""
+        key = section_key(b,d,t_w,t_f,d_stif,t_stif,n_stif,mesh_scale,n_stif_web)
+        if self.dtype != np.float64:
+            key += '-' + self.dtype.name
+        return key
+
+    def section(self, b,d,t_w,t_f,d_stif,t_stif,n_stif,mesh_scale=1.0,n_stif_web=None):
+        """Return the SectionData for a geometry, meshing and analysing it on a miss"""
+        key = self.key(b,d,t_w,t_f,d_stif,t_stif,n_stif,mesh_scale,n_stif_web)
+        data = self.get(key)
+        if data is None:
+            section = section_funcs.boxsection(b,d,t_w,t_f,d_stif,t_stif,n_stif,mesh_scale,n_stif_web)
+            data = section_funcs.section_data(section_funcs.analyse_section(section),self.dtype)
+            self.put(key, data)
+        return data
+
+def data_bytes(data):
+    """Bytes of the mesh and stress arrays of a SectionData"""
+    arrays = [data.mesh_nodes, data.mesh_elements] + list(data.unit.values())
+    return sum(np.asarray(array).nbytes for array in arrays)
+
+class SharedSections:
+    """
+    Process-wide set of analysed sections, shared by every session and thread.
+    Sections are written to a SectionCache and held as its memory-mapped
+    arrays, with least recently used sections dropped once the arrays held
+    exceed max_bytes.
+    cache: SectionCache the sections are stored in (the default directory if None)
+    """
+    def __init__(self, cache=None, max_bytes=SHARED_MAX_BYTES):
+        self.cache = cache or SectionCache()
+        self.max_bytes = max_bytes
+        self.sections = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        """SectionData of a cache key, from memory, the disk cache or build() in that order"""
+        with self.lock:
+            if key in self.sections:
+                self.sections.move_to_end(key)
+                return self.sections[key]
+        data = self.cache.get(key)
+        if data is None:
+            built = build()
+            self.cache.put(key, built)
+            data = self.cache.get(key) or built #the built arrays if the entry was evicted at once
+        with self.lock:
+            if key not in self.sections:
+                self.sections[key] = data
+                self.nbytes += data_bytes(data)
+                while self.nbytes > self.max_bytes and len(self.sections) > 1:
+                    _, old = self.sections.popitem(last=False)
+                    self.nbytes -= data_bytes(old)
+            return self.sections[key]
+
+    def section(self, b,d,t_w,t_f,d_stif,t_stif,n_stif,mesh_scale=1.0,n_stif_web=None):
+        """Return the SectionData for a geometry, meshing and analysing it on a miss"""
+        geometry = (b,d,t_w,t_f,d_stif,t_stif,n_stif,mesh_scale,n_stif_web)
+        return self.get(self.cache.key(*geometry),
+                        lambda: section_funcs.section_data(section_funcs.analyse_section(section_funcs.boxsection(*geometry)),
+                                                           self.cache.dtype))
+
+    def clear(self):
+        """Drop every section held in memory (the disk cache is kept)"""
+        with self.lock:
+            self.sections.clear()
+            self.nbytes = 0
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_sections():
+    """The process-wide SharedSections on the default cache directory, created on first use"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SharedSections()
+        return _shared
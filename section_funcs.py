@@ -1,167 +1,243 @@
 
-
-import matplotlib.pyplot as plt
-
 import numpy as np
 
-import streamlit as st
-
+import plots
+import profiling
 
-#Import unit aware modules
-import forallpeople as u
-u.environment('structural')
+#matplotlib, streamlit and forallpeople are only imported by the plotting and
+#report functions, so the calculation chain can be imported headless
 
-def boxgenerator(b,d,t_w,t_f,d_stif,t_stif,n_stif):
+def boxgenerator(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web=None):
     """
     This function allows for generation of a stiffened box section
     This only works with Pint units aware data in SI format at the moment.
+    Returns the section and its geometry plot as a plots.LazyFigure,
+    which is only drawn when shown.
     """
-    import copy
-    import sectionproperties.pre.sections as sections
-    from sectionproperties.analysis.cross_section import CrossSection
+    section = boxsection(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web=n_stif_web)
+    key = plots.figure_key('section', b=b, d=d, t_w=t_w, t_f=t_f, d_stif=d_stif, t_stif=t_stif,
+                           n_stif=n_stif, n_stif_web=web_stiffeners(n_stif,n_stif_web))
+    return section, plots.LazyFigure(key, lambda: plot_section(section.geometry))
+
+def plot_section(geometry):
+    """Plot a box_geometry (no mesh or analysis needed), returning the figure and axes"""
+    import matplotlib.pyplot as plt
 
-    # Create the main box sections
-    top_flange = sections.RectangularSection(d=t_f, b=b, shift=[0,d-t_f])
-    bot_flange = sections.RectangularSection(d=t_f, b=b, shift=[0,0])
-    left_web = sections.RectangularSection(d=d-2*t_f, b=t_w, shift=[0,t_f])
-    right_web = sections.RectangularSection(d=d-2*t_f, b=t_w, shift=[b-t_w,t_f])
-
-    if n_stif == 3:
-        #Create top stiffeners
-        top_stif1 = sections.RectangularSection(d=d_stif, b=t_stif, shift=[(b-t_stif)/2,d-t_f-d_stif])
-
-        top_stif2 = copy.deepcopy(top_stif1)
-        top_stif3 = copy.deepcopy(top_stif1)
-        top_stif2.shift = [-b/4,0]
-        top_stif3.shift = [b/4,0]
-        top_stif2.shift_section()
-        top_stif3.shift_section()
-
-        #Create left stiffeners
-        left_stif1 = sections.RectangularSection(d=t_stif, b=d_stif, shift=[t_w,(d-t_stif)/2])
-
-        left_stif2 = copy.deepcopy(left_stif1)
-        left_stif3 = copy.deepcopy(left_stif1)
-        left_stif2.shift = [0,-d/4]
-        left_stif3.shift = [0,d/4]
-        left_stif2.shift_section()
-        left_stif3.shift_section()
-
-        #Create right stiffeners
-        right_stif1 = copy.deepcopy(left_stif1)
-        right_stif2 = copy.deepcopy(left_stif2)
-        right_stif3 = copy.deepcopy(left_stif3)
-        right_stif1.shift = [b-2*t_w-d_stif,0]
-        right_stif2.shift = [b-2*t_w-d_stif,0]
-        right_stif3.shift = [b-2*t_w-d_stif,0]
-        right_stif1.shift_section()
-        right_stif2.shift_section()
-        right_stif3.shift_section()
-
-        # create a list of the sections to be merged
-        section_list = [top_flange, bot_flange, left_web, right_web, 
-                        top_stif1,top_stif2,top_stif3,
-                        left_stif1,left_stif2,left_stif3,
-                    right_stif1,right_stif2,right_stif3]
-
-    elif n_stif == 2:
-        #Create top stiffeners
-        top_stif1 = sections.RectangularSection(d=d_stif, b=t_stif, shift=[(b-t_stif)/3.0,d-t_f-d_stif])
-
-        top_stif2 = copy.deepcopy(top_stif1)
-        top_stif2.shift = [b/3,0]
-        top_stif2.shift_section()
-
-        #Create left stiffeners
-        left_stif1 = sections.RectangularSection(d=t_stif, b=d_stif, shift=[t_w,(d-t_stif)/3])
-
-        left_stif2 = copy.deepcopy(left_stif1)
-        left_stif2.shift = [0,d/3]
-        left_stif2.shift_section()
-
-        #Create right stiffeners
-        right_stif1 = copy.deepcopy(left_stif1)
-        right_stif2 = copy.deepcopy(left_stif2)
-        right_stif1.shift = [b-2*t_w-d_stif,0]
-        right_stif2.shift = [b-2*t_w-d_stif,0]
-        right_stif1.shift_section()
-        right_stif2.shift_section()
-
-        # create a list of the sections to be merged
-        section_list = [top_flange, bot_flange, left_web, right_web, 
-                        top_stif1,top_stif2,
-                        left_stif1,left_stif2,
-                    right_stif1,right_stif2]
-    else:
-        print("Number of stiffeners not supported")
-
-    # merge the three sections into one geometry object
-    geometry = sections.MergedSection(section_list)
-
-    geometry.clean_geometry(verbose=False) # clean the geometry
-    geometry.add_hole([b/2, d/2])
     fig,ax = plt.subplots()
     ax.set_aspect('equal')
     geometry.plot_geometry(ax=ax)  # plot the geometry
+    return fig, ax
 
-    # create a mesh - use a mesh size of 12 for the RHS, 6 for stiffeners
-    rhs_mesh=d/6
-    stif_mesh=t_stif
-    
-    if n_stif == 3:
-        mesh = geometry.create_mesh(mesh_sizes=[rhs_mesh,rhs_mesh,rhs_mesh,rhs_mesh,
-                                                stif_mesh,stif_mesh,stif_mesh,stif_mesh,
-                                                stif_mesh,stif_mesh,stif_mesh,stif_mesh,stif_mesh])
-    elif n_stif == 2:
-        mesh = geometry.create_mesh(mesh_sizes=[rhs_mesh,rhs_mesh,rhs_mesh,rhs_mesh,
-                                                stif_mesh,stif_mesh,stif_mesh,
-                                                stif_mesh,stif_mesh,stif_mesh])
-    else:
-        print("Number of stiffeners not supported")
-
-    section = CrossSection(geometry, mesh) # create a CrossSection object
+def boxsection(b,d,t_w,t_f,d_stif,t_stif,n_stif,mesh_scale=1.0,n_stif_web=None):
+    """
+    Build and mesh the stiffened box CrossSection without any plotting.
+    Inputs are plain floats in SI units (m).
+    mesh_scale: element edge length as a multiple of the plate thickness (see mesh_sizes),
+    < 1 for a finer mesh
+    n_stif_web: number of stiffeners on each web (None for the same as n_stif)
+    """
+    with profiling.span('geometry'):
+        geometry = box_geometry(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web)
+    return mesh_geometry(geometry,t_w,t_f,t_stif,mesh_scale)
+
+def mesh_geometry(geometry,t_w,t_f,t_stif,mesh_scale=1.0):
+    """Mesh a box_geometry and create its CrossSection"""
+    from sectionproperties.analysis.cross_section import CrossSection
+
+    with profiling.span('mesh') as record:
+        # create a mesh - flanges, webs and then the stiffeners, in box_plates order
+        flange_mesh, web_mesh, stif_mesh = mesh_sizes(t_w,t_f,t_stif,mesh_scale)
+        mesh = geometry.create_mesh(mesh_sizes=[flange_mesh]*2 + [web_mesh]*2 + [stif_mesh]*(len(geometry.control_points)-4))
+        section = CrossSection(geometry, mesh) # create a CrossSection object
+        record['nodes'] = len(section.mesh_nodes)
+        record['elements'] = len(section.mesh_elements)
     
-    return section, fig, ax
+    return section
+
+def box_geometry(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web=None):
+    """
+    Merged geometry of the box plates and longitudinal stiffeners, built directly
+    from the plate rectangles of box_plates, with the box plates first and then
+    one region per stiffener
+    """
+    import sectionproperties.pre.sections as sections
+
+    rects = box_plates(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web)
+    x0, y0, x1, y1 = rects.T
+
+    #Corners of each rectangle anticlockwise, merging the corners shared by touching plates
+    corners = np.stack([x0, y0, x1, y0, x1, y1, x0, y1], axis=1).reshape(-1, 2)
+    tol = 1e-9 * max(b, d)
+    _, first, index = np.unique(np.round(corners / tol), axis=0, return_index=True, return_inverse=True)
+    points = corners[first]
+    index = np.asarray(index).reshape(-1, 4)
 
+    #Split every rectangle edge at the points lying on it, so touching plates share facets
+    facets = set()
+    for edges in index:
+        for i, j in zip(edges, np.roll(edges, -1)):
+            along = 0 if abs(points[i, 1] - points[j, 1]) < tol else 1
+            lo, hi = sorted((points[i, along], points[j, along]))
+            on_edge = np.flatnonzero((np.abs(points[:, 1-along] - points[i, 1-along]) < tol)
+                                     & (points[:, along] > lo - tol) & (points[:, along] < hi + tol))
+            on_edge = on_edge[np.argsort(points[on_edge, along])].tolist()
+            facets.update(tuple(sorted(pair)) for pair in zip(on_edge[:-1], on_edge[1:]))
 
-def in_plane_principle(section,Fy,Fz,Mx,My,Mz):
+    control_points = np.column_stack([(x0 + x1) / 2, (y0 + y1) / 2])
+    return sections.CustomSection(points.tolist(), [list(facet) for facet in sorted(facets)],
+                                  [[b/2, d/2]], control_points.tolist())
+
+def box_plates(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web=None):
     """
-    Determine in plane stresses and output peak stresses
+    Plates of the stiffened box as an (n_plates, 4) array of [x0, y0, x1, y1]:
+    the top and bottom flanges, the left and right webs, the top flange
+    stiffeners and then the left and right web stiffener pairs.
+    n_stif: number of stiffeners on the top flange
+    n_stif_web: number of stiffeners on each web (None for the same as n_stif)
+    Raises a ValueError if any plates overlap or the centre of the box is not void (see check_plates).
     """
-    stress_post = section.calculate_stress(Vy = Fy,
-                                        Vx = Fz,
-                                        Mxx = Mz,
-                                        Myy = My,
-                                        Mzz = Mx)
-    col1, col2 = st.beta_columns(2)
-    col1.markdown("**Principle Stresses due to BM only**")
-    stress_post.plot_stress_m_zz()
-    # https://sectionproperties.readthedocs.io/en/latest/rst/api.html?highlight=m_zz#sectionproperties.analysis.cross_section.StressPost.plot_stress_m_zz
-    col1.pyplot()
-    col2.markdown("**Shear Stresses due to $F_y$ and $F_z$**")
-    stress_post.plot_stress_v_zxy()
-    # https://sectionproperties.readthedocs.io/en/latest/rst/api.html?highlight=v_zxy#sectionproperties.analysis.cross_section.StressPost.plot_vector_v_zxy
-    col2.pyplot()
-    stresses = stress_post.get_stress()
-    f_star_s_comp = stresses[0]['sig_zz_m'].max() * u.N/u.m**2
-    f_star_s_tens = stresses[0]['sig_zz_m'].min() * u.N/u.m**2
+    n_stif_web = web_stiffeners(n_stif, n_stif_web)
+    x = stiffener_centres(b,t_stif,n_stif)
+    y = stiffener_centres(d,t_stif,n_stif_web)
+    plates = [[[0, d-t_f, b, d], #top flange
+               [0, 0, b, t_f], #bottom flange
+               [0, t_f, t_w, d-t_f], #left web
+               [b-t_w, t_f, b, d-t_f]], #right web
+              np.column_stack([x-t_stif/2, np.full_like(x, d-t_f-d_stif), x+t_stif/2, np.full_like(x, d-t_f)]), #top stiffeners
+              np.column_stack([np.full_like(y, t_w), y-t_stif/2, np.full_like(y, t_w+d_stif), y+t_stif/2, #left stiffeners
+                               np.full_like(y, b-t_w-d_stif), y-t_stif/2, np.full_like(y, b-t_w), y+t_stif/2]).reshape(-1, 4)] #right stiffeners
+    plates = np.concatenate(plates).astype(float)
+    check_plates(plates,b,d,n_stif)
+    return plates
+
+def plate_name(i, n_stif):
+    """Name of plate i of box_plates"""
+    if i < 4:
+        return ('top flange', 'bottom flange', 'left web', 'right web')[i]
+    if i < 4 + n_stif:
+        return f'top stiffener {i-3}'
+    i -= 4 + n_stif
+    return f"{('left', 'right')[i % 2]} web stiffener {i//2 + 1}"
+
+def check_plates(plates,b,d,n_stif):
+    """
+    Raise a ValueError if plates of box_plates have no thickness, overlap one
+    another (touching is allowed) or cover the centre of the box, which is the
+    point marking the void of the section.
+    """
+    tol = 1e-9 * max(b, d)
+    x0, y0, x1, y1 = plates.T
+    empty = np.flatnonzero((x1 - x0 <= tol) | (y1 - y0 <= tol))
+    if len(empty):
+        raise ValueError(f"The {plate_name(empty[0],n_stif)} has no thickness or depth")
+    overlap = ((np.minimum(x1[:, None], x1) - np.maximum(x0[:, None], x0) > tol)
+               & (np.minimum(y1[:, None], y1) - np.maximum(y0[:, None], y0) > tol))
+    np.fill_diagonal(overlap, False)
+    if overlap.any():
+        i, j = np.argwhere(overlap)[0]
+        raise ValueError(f"The {plate_name(i,n_stif)} and {plate_name(j,n_stif)} overlap; "
+                         f"reduce the stiffener depth or number of stiffeners")
+    covered = np.flatnonzero((x0 < b/2) & (b/2 < x1) & (y0 < d/2) & (d/2 < y1))
+    if len(covered):
+        raise ValueError(f"The {plate_name(covered[0],n_stif)} fills the centre of the box; reduce the stiffener depth")
+
+def web_stiffeners(n_stif, n_stif_web=None):
+    """Number of stiffeners on each web, where None (or NaN) means the same number as on the flange"""
+    if n_stif_web is None or n_stif_web != n_stif_web:
+        return int(n_stif)
+    return int(n_stif_web)
+
+def stiffener_centres(length,t_stif,n_stif):
+    """Centre-line positions of the longitudinal stiffeners along a plate, as placed by boxsection"""
+    if n_stif == 2:
+        return np.array([(length-t_stif)/3 + t_stif/2, (length-t_stif)/3 + t_stif/2 + length/3])
+    return np.arange(1, n_stif+1) * length/(n_stif+1)
+
+def mesh_sizes(t_w,t_f,t_stif,mesh_scale=1.0):
+    """
+    Mesh sizes (flange_mesh, web_mesh, stif_mesh) used by boxsection for the flanges,
+    webs and stiffeners. These are the maximum element areas passed to create_mesh,
+    of triangles with edges of mesh_scale times the plate thickness. The plates limit
+    the mesh to about 2 elements per thickness, so mesh_scale >= 2 gives the coarsest mesh.
+    """
+    return tuple((mesh_scale * t)**2 / 2 for t in (t_f, t_w, t_stif))
+
+def analyse_section(section):
+    """
+    Run the geometric and warping analyses required before stresses can be recovered
+    """
+    with profiling.span('geometric_properties', elements=len(section.mesh_elements)):
+        section.calculate_geometric_properties(time_info=False)
+    with profiling.span('warping_properties', elements=len(section.mesh_elements)):
+        section.calculate_warping_properties(time_info=False)
+    return section
+
+def section_stresses(section,Fy,Fz,Mx,My,Mz):
+    """
+    Recover the nodal stresses for one set of actions without any plotting.
+    Returns the stress post-processing object and the list of stress dicts.
+    """
+    with profiling.span('stress_recovery', nodes=len(section.mesh_nodes)):
+        stress_post = section.calculate_stress(Vy = Fy,
+                                            Vx = Fz,
+                                            Mxx = Mz,
+                                            Myy = My,
+                                            Mzz = Mx)
+        stresses = stress_post.get_stress()
+    return stress_post, stresses
+
+
+def in_plane_principle(section,Fy,Fz,Mx,My,Mz,key=None):
+    """
+    Determine in plane stresses and output peak stresses.
+    The stress contour plots are returned as LazyFigures (see stress_figures)
+    and only drawn if they are shown.
+    """
+    import streamlit as st
+    import forallpeople as u
+    u.environment('structural')
+
+    stresses = recover_stresses(section,Fy,Fz,Mx,My,Mz)
+    f_star_s_comp = stresses['sig_zz_m'].max() * u.N/u.m**2
+    f_star_s_tens = stresses['sig_zz_m'].min() * u.N/u.m**2
     st.text(f'The maximum comp/tension stresses in the section are:\n'
         f'f_star_s_comp = {f_star_s_comp.to(u.MPa)}\n'
         f'f_star_s_tens = {f_star_s_tens.to(u.MPa)}')
     
-    return f_star_s_comp, f_star_s_tens, stresses
+    return f_star_s_comp, f_star_s_tens, [stresses], stress_figures(section,Fy,Fz,Mx,My,Mz,key)
+
+def stress_figures(section,Fy,Fz,Mx,My,Mz,key=None):
+    """
+    Contour plots of the bending stress and the shear stress due to Fy and Fz,
+    as a pair of plots.LazyFigure. The full stress recovery they need is only
+    run when the first of them is drawn.
+    key: cache key of the design and loads (see plots.figure_key), or None to not cache the images
+    """
+    stress_post = []
+
+    def draw(plot):
+        import matplotlib.pyplot as plt
+
+        if not stress_post:
+            stress_post.append(section_stresses(section,Fy,Fz,Mx,My,Mz)[0])
+        with profiling.span('plot_stresses'):
+            getattr(stress_post[0], plot)()
+        fig = plt.gcf()
+        return fig, fig.axes[0]
+
+    # https://sectionproperties.readthedocs.io/en/latest/rst/api.html?highlight=m_zz#sectionproperties.analysis.cross_section.StressPost.plot_stress_m_zz
+    # https://sectionproperties.readthedocs.io/en/latest/rst/api.html?highlight=v_zxy#sectionproperties.analysis.cross_section.StressPost.plot_vector_v_zxy
+    return tuple(plots.LazyFigure(key and plots.figure_key(plot, design=key), lambda plot=plot: draw(plot))
+                 for plot in ('plot_stress_m_zz', 'plot_stress_v_zxy'))
 
 # Extract stress from the critical locations at the longitudinal flange stiffener
 # Result type can only be max, min or mean
+# For repeated queries on the same mesh use node_index.NodeIndex.aggregate
 def stress_location(x_stif,y_stif,tol_x,tol_y,nodes_xy,stresses,result_type):
-    output = []
     x = nodes_xy[:,0]
     y = nodes_xy[:,1]
-    for x,y,stress in zip(x,y,stresses):
-        if (x_stif - tol_x) <= x <= (x_stif + tol_x)  and (y_stif - tol_y) <= y <= (y_stif + tol_y):
-            output.append(stress)
-        else:
-            pass
+    inside = ((x_stif - tol_x) <= x) & (x <= (x_stif + tol_x)) & ((y_stif - tol_y) <= y) & (y <= (y_stif + tol_y))
+    output = np.asarray(stresses)[inside]
     if result_type == "max":
         return abs(max(output))
     elif result_type == "min":
@@ -169,3 +245,178 @@ def stress_location(x_stif,y_stif,tol_x,tol_y,nodes_xy,stresses,result_type):
     elif result_type == "mean":
         return abs(np.mean(output))
 
+#Order of the actions in the unit stress fields and load case matrices
+UNIT_ACTIONS = ('Fy','Fz','Mx','My','Mz')
+
+#Stress components read by the checks
+CHECK_COMPONENTS = ('sig_zz_m', 'sig_zy_vy', 'sig_zxy_mzz')
+
+#Components recover_stresses can return, as per StressPost.get_stress,
+#and the nodal components each combined one is built from
+STRESS_COMPONENTS = ('sig_zz_mxx', 'sig_zz_myy', 'sig_zx_mzz', 'sig_zy_mzz',
+                     'sig_zx_vx', 'sig_zy_vx', 'sig_zx_vy', 'sig_zy_vy')
+COMBINED_COMPONENTS = {'sig_zz_m': ('sig_zz_mxx', 'sig_zz_myy'),
+                       'sig_zxy_mzz': ('sig_zx_mzz', 'sig_zy_mzz')}
+
+def _tri6_gauss():
+    """Weights, shape functions (6, 6) and isoparametric derivatives (6, 3, 6) at the 6 Gauss points of a tri 6 element"""
+    from sectionproperties.analysis import fea
+
+    gps = fea.gauss_points(6)
+    eta, xi, zeta = gps[:,1], gps[:,2], gps[:,3]
+    zero = np.zeros_like(eta)
+    N = np.column_stack([eta*(2*eta-1), xi*(2*xi-1), zeta*(2*zeta-1), 4*eta*xi, 4*xi*zeta, 4*eta*zeta])
+    B_iso = np.stack([[4*eta-1, zero, zero, 4*xi, zero, 4*zeta],
+                      [zero, 4*xi-1, zero, 4*eta, 4*zeta, zero],
+                      [zero, zero, 4*zeta-1, zero, 4*xi, 4*eta]]).transpose(2, 0, 1)
+    return gps[:,0], N, B_iso
+
+def recover_stresses(section,Fy=0,Fz=0,Mx=0,My=0,Mz=0,components=CHECK_COMPONENTS,dtype=np.float64):
+    """
+    Nodal values of only the requested stress components for one set of actions,
+    without building the full StressPost of section_stresses.
+    Follows CrossSection.calculate_stress (single material), evaluated for all
+    elements at once. Components driven by a zero action are returned as zeros
+    without reading the warping (Mx) or shear (Fy, Fz) functions.
+    components: names from STRESS_COMPONENTS or COMBINED_COMPONENTS
+    Returns a dict of (n_nodes,) arrays of dtype.
+    """
+    from sectionproperties.analysis import fea
+
+    fields = set()
+    for component in components:
+        fields.update(COMBINED_COMPONENTS.get(component, (component,)))
+    unknown = fields.difference(STRESS_COMPONENTS)
+    if unknown:
+        raise ValueError(f"Unknown stress components {sorted(unknown)}")
+    #Drop the fields of zero actions, which stay zero
+    active = {field for field in fields
+              if not (field.endswith('_mzz') and Mx == 0 or field.endswith('_vx') and Fz == 0 or field.endswith('_vy') and Fy == 0)}
+
+    props = section.section_props
+    elements = np.asarray(section.mesh_elements)
+    n_nodes = len(section.mesh_nodes)
+    E = section.elements[0].material.elastic_modulus
+    weights, N, B_iso = _tri6_gauss()
+
+    nodal = {field: np.zeros(n_nodes) for field in fields}
+    if active:
+        coords = np.asarray(section.mesh_nodes)[elements] - [props.cx, props.cy] #(n_el, 6, 2)
+        ixx, iyy, ixy = props.ixx_c, props.iyy_c, props.ixy_c
+        det = ixx * iyy - ixy**2
+        nodal_fns = {'mzz': ('omega', Mx / props.j), 'vx': ('psi_shear', Fz / props.Delta_s), 'vy': ('phi_shear', Fy / props.Delta_s)}
+        nodal_fns = {kind: (getattr(props, name)[elements], factor) for kind, (name, factor) in nodal_fns.items()
+                     if f'sig_zx_{kind}' in active or f'sig_zy_{kind}' in active}
+        gp_values = {field: np.empty((6, len(elements))) for field in active}
+        for g in range(6):
+            Nx = coords[:,:,0] @ N[g]
+            Ny = coords[:,:,1] @ N[g]
+            if 'sig_zz_mxx' in active:
+                gp_values['sig_zz_mxx'][g] = E * (-(ixy * Mz) / det * Nx + (iyy * Mz) / det * Ny)
+            if 'sig_zz_myy' in active:
+                gp_values['sig_zz_myy'][g] = E * (-(ixx * My) / det * Nx + (ixy * My) / det * Ny)
+            if not nodal_fns:
+                continue
+
+            #Cartesian shape function derivatives B (n_el, 2, 6)
+            J = np.ones((len(elements), 3, 3))
+            J[:,1:,:] = np.einsum('ekc,jk->ecj', coords, B_iso[g])
+            B = np.einsum('eji,jk->eik', np.linalg.inv(J)[:,:,1:], B_iso[g])
+            r, q = Nx**2 - Ny**2, 2 * Nx * Ny
+            offsets = {'mzz': (Ny, -Nx),
+                       'vx': (props.nu_eff / 2 * (ixx * r - ixy * q), props.nu_eff / 2 * (ixy * r + ixx * q)),
+                       'vy': (props.nu_eff / 2 * (-ixy * r + iyy * q), props.nu_eff / 2 * (-iyy * r - ixy * q))}
+            for kind, (function, factor) in nodal_fns.items():
+                gradient = np.einsum('eik,ek->ie', B, function)
+                for axis, field in enumerate((f'sig_zx_{kind}', f'sig_zy_{kind}')):
+                    if field in active:
+                        gp_values[field][g] = E * factor * (gradient[axis] - offsets[kind][axis])
+
+        #Extrapolate to the element nodes and average at shared nodes as calculate_stress does
+        node_weights = np.bincount(elements.ravel(), np.tile(weights, len(elements)), minlength=n_nodes)
+        node_weights[node_weights == 0] = 1
+        for field, values in gp_values.items():
+            element_values = fea.extrapolate_to_nodes(values).T * weights
+            nodal[field] = np.bincount(elements.ravel(), element_values.ravel(), minlength=n_nodes) / node_weights
+
+    stresses = {}
+    for component in components:
+        if component == 'sig_zz_m':
+            stresses[component] = nodal['sig_zz_mxx'] + nodal['sig_zz_myy']
+        elif component == 'sig_zxy_mzz':
+            stresses[component] = np.hypot(nodal['sig_zx_mzz'], nodal['sig_zy_mzz'])
+        else:
+            stresses[component] = nodal[component]
+        stresses[component] = stresses[component].astype(dtype)
+    return stresses
+
+#Unit stress fields kept for superposition, with the unit action and recovered component of each
+UNIT_FIELDS = {'sig_zz_My': ('My', 'sig_zz_m'),
+               'sig_zz_Mz': ('Mz', 'sig_zz_m'),
+               'sig_zy_vy': ('Fy', 'sig_zy_vy'),
+               'sig_zxy_mzz': ('Mx', 'sig_zxy_mzz')}
+
+def unit_stresses(section,dtype=np.float64):
+    """
+    Nodal stress fields for a unit value of the actions read by the checks.
+    Section stresses are linear in the actions, so any load case can be
+    rebuilt from these by superposition (see superpose_stresses).
+    Only the components the checks read are recovered (Fz drives none of them).
+    Returns a dict of (n_nodes,) arrays of dtype keyed as UNIT_FIELDS.
+    """
+    unit = {}
+    with profiling.span('unit_stresses', nodes=len(section.mesh_nodes)):
+        for name, (action, component) in UNIT_FIELDS.items():
+            unit[name] = recover_stresses(section,**{action: 1},components=(component,),dtype=dtype)[component]
+    return unit
+
+def superpose_stresses(unit,actions):
+    """
+    Rebuild the stress fields used by the checks for many load cases at once.
+    unit: output of unit_stresses
+    actions: (n_cases, 5) array of actions in UNIT_ACTIONS order
+    Returns 'sig_zz_m', 'sig_zy_vy' and 'sig_zxy_mzz' as (n_cases, n_nodes) arrays.
+    """
+    actions = np.atleast_2d(np.asarray(actions, dtype=float))
+    Fy, Mx, My, Mz = actions[:,0:1], actions[:,2:3], actions[:,3:4], actions[:,4:5]
+    return {
+        'sig_zz_m': My * unit['sig_zz_My'] + Mz * unit['sig_zz_Mz'],
+        'sig_zy_vy': Fy * unit['sig_zy_vy'],
+        'sig_zxy_mzz': np.abs(Mx) * unit['sig_zxy_mzz'],
+    }
+
+class SectionData:
+    """
+    Mesh, section properties and unit-action stress fields of an analysed section.
+    Holds only the arrays read by the checks, so it can be stored on disk and
+    shared between processes in place of the full CrossSection.
+    props: dict of area, cx, cy, ixx_c, iyy_c, ixy_c and j
+    unit: output of unit_stresses
+    """
+    def __init__(self, mesh_nodes, mesh_elements, props, unit):
+        self.mesh_nodes = mesh_nodes
+        self.mesh_elements = mesh_elements
+        self.props = props
+        self.unit = unit
+
+    def get_area(self):
+        return self.props['area']
+
+    def get_c(self):
+        return self.props['cx'], self.props['cy']
+
+    def get_ic(self):
+        return self.props['ixx_c'], self.props['iyy_c'], self.props['ixy_c']
+
+    def get_j(self):
+        return self.props['j']
+
+def section_data(section,dtype=np.float64):
+    """Extract the SectionData of an analysed CrossSection, with unit stress fields of dtype"""
+    (cx, cy) = section.get_c()
+    (ixx_c, iyy_c, ixy_c) = section.get_ic()
+    props = {'area': section.get_area(), 'cx': cx, 'cy': cy,
+             'ixx_c': ixx_c, 'iyy_c': iyy_c, 'ixy_c': ixy_c, 'j': section.get_j()}
+    return SectionData(section.mesh_nodes, section.mesh_elements,
+                       {key: float(value) for key, value in props.items()},
+                       unit_stresses(section,dtype))
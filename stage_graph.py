@@ -0,0 +1,123 @@
+"""
+Incremental recomputation of the calculation chain.
+
+The chain is a dependency graph of stages
+
+    geometry -> mesh -> section -> unit_stresses -> critical_stresses -> clause_checks
+                                               \-> utilisation
+
+and each stage is memoised on the inputs it reads plus the keys of the
+stages it depends on. Changing a load only re-runs the stress superposition
+and the checks; changing a_panel or f_y only re-runs the checks.
+
+The unit stress fields are held by section_cache.shared_sections, as
+memory-mapped arrays shared with other processes using the same cache. They
+are looked up by the section geometry first, so the mesh and section stages
+only run on a cache miss or when the page draws the CrossSection, and only
+the latest mesh and CrossSection are kept.
+"""
+import threading
+from collections import OrderedDict
+
+import engine
+import functions as fnc
+import profiling
+import section_cache
+import section_funcs
+import utilisation
+
+class CalcGraph:
+    """
+    Memoised dependency graph of calculation stages.
+    stages: dict of name: (func, inputs, deps) where func(params, *dep_values)
+    computes the stage from the named params and the values of its deps
+    maxsize: number of results kept per stage
+    sizes: optional dict of stage name: number of results kept, overriding maxsize
+    The graph may be shared between sessions and threads: stages for different
+    inputs are computed concurrently, while a stage already being computed for
+    the same inputs is waited for rather than computed again.
+    """
+    def __init__(self, stages, maxsize=8, sizes=None):
+        self.stages = stages
+        self.maxsize = maxsize
+        self.sizes = {name: maxsize for name in stages}
+        self.sizes.update(sizes or {})
+        self.memo = {name: OrderedDict() for name in stages}
+        self.runs = dict.fromkeys(stages, 0)
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def key(self, name, params):
+        """Key of a stage: its own inputs and the keys of its dependencies"""
+        func, inputs, deps = self.stages[name]
+        return (tuple(params[i] for i in inputs), tuple(self.key(dep, params) for dep in deps))
+
+    def get(self, name, params):
+        """Value of a stage for params, computing it and any stale dependencies"""
+        key = self.key(name, params)
+        memo = self.memo[name]
+        while True:
+            with self.lock:
+                if key in memo:
+                    memo.move_to_end(key)
+                    return memo[key]
+                pending = self.pending.get((name, key))
+                if pending is None:
+                    pending = self.pending[(name, key)] = threading.Event()
+                    break
+            pending.wait() #computed by another thread, or failed there and retried here
+
+        try:
+            func, inputs, deps = self.stages[name]
+            values = [self.get(dep, params) for dep in deps]
+            with profiling.span(name):
+                value = func(params, *values)
+            with self.lock:
+                memo[key] = value
+                self.runs[name] += 1
+                if len(memo) > self.sizes[name]:
+                    memo.popitem(last=False)
+            return value
+        finally:
+            with self.lock:
+                self.pending.pop((name, key)).set()
+
+def _shared_data(graph, params):
+    """
+    SectionData of the section of params, held once per process by section_cache.shared_sections.
+    The graph's section stage is only run if the section is in neither memory nor the disk cache.
+    """
+    shared = section_cache.shared_sections()
+    return shared.get(shared.cache.key(*engine.geometry_key(params)),
+                      lambda: section_funcs.section_data(graph.get('section', params),shared.cache.dtype))
+
+def design_graph(maxsize=8):
+    """CalcGraph of the box girder design checks, with params as per engine design and load records"""
+    plates = ('b', 'd', 't_w', 't_f', 'd_stif', 't_stif', 'n_stif', 'n_stif_web')
+    stages = {
+        'geometry': (lambda p: section_funcs.box_geometry(*[p[i] for i in plates]), plates, ()),
+        'mesh': (lambda p, geometry: section_funcs.mesh_geometry(geometry,p['t_w'],p['t_f'],p['t_stif'],p['mesh_scale']),
+                 ('t_w', 't_f', 't_stif', 'mesh_scale'), ('geometry',)),
+        'section': (lambda p, mesh: section_funcs.analyse_section(mesh), (), ('mesh',)),
+        'unit_stresses': (lambda p: _shared_data(graph,p), engine.GEOMETRY_KEYS, ()),
+        'critical_stresses': (lambda p, data: engine.fe_critical_stresses(data,p,p),
+                              ('b', 'd', 't_w', 't_f', 'n_stif', 'n_stif_web') + section_funcs.UNIT_ACTIONS, ('unit_stresses',)),
+        'clause_checks': (lambda p, crit: engine.clause_checks(p,crit),
+                          ('b', 'd', 't_f', 'n_stif', 'a_panel', 'f_y', 'phi'), ('critical_stresses',)),
+        'utilisation': (lambda p, data: utilisation.element_utilisation(data,p,p),
+                        plates + ('f_y', 'phi') + section_funcs.UNIT_ACTIONS, ('unit_stresses',)),
+    }
+    #Meshes and CrossSections are large, and only needed to fill the cache or draw the section
+    graph = CalcGraph(stages, maxsize, sizes={'mesh': 1, 'section': 1})
+    return graph
+
+def evaluate(graph,design,loads):
+    """Result record as per engine.check_design, recomputing only the stale stages"""
+    params = {**engine.DESIGN_DEFAULTS, **engine.LOAD_DEFAULTS, **design, **loads}
+    n_stif_web = section_funcs.web_stiffeners(params['n_stif'],params['n_stif_web'])
+    b_flange, b_web = fnc.longit_stif_spacing.value(params['b'],params['d'],params['n_stif'],n_stif_web)
+    result = {'b_flange': b_flange, 'b_web': b_web}
+    result.update(graph.get('unit_stresses', params).props)
+    result.update(graph.get('critical_stresses', params))
+    result.update(graph.get('clause_checks', params))
+    return result
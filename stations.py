@@ -0,0 +1,60 @@
+"""
+Along-girder station analysis sharing one section solve.
+
+For a prismatic girder every station has the same section, so the unit-action
+stress fields are computed once and the stresses and clause checks at
+hundreds of stations are one vectorised superposition (see load_cases).
+Action diagrams come from simple-span formulas or user-supplied arrays.
+"""
+import numpy as np
+import pandas as pd
+
+import engine
+import load_cases
+
+def simple_span_actions(L, w_y=0.0, w_z=0.0, t_x=0.0, F_x=0.0, n_stations=201):
+    """
+    Action diagrams of a simply supported span of length L (m) under uniform loads.
+    w_y: vertical load (N/m) giving Fy and Mz
+    w_z: horizontal load (N/m) giving Fz and My
+    t_x: uniform torque (Nm/m) giving Mx, with both ends torsionally restrained
+    F_x: constant axial force (N)
+    Returns a DataFrame of x and the actions Fx..Mz at each station.
+    """
+    x = np.linspace(0, L, n_stations)
+    return actions_from_arrays(x,
+                               Fx=np.full_like(x, F_x),
+                               Fy=w_y * (L/2 - x),
+                               Fz=w_z * (L/2 - x),
+                               Mx=t_x * (L/2 - x),
+                               My=w_z * x * (L - x) / 2,
+                               Mz=w_y * x * (L - x) / 2)
+
+def actions_from_arrays(x, **actions):
+    """
+    Action diagrams from user-supplied arrays of Fx, Fy, Fz, Mx, My and/or Mz
+    at stations x (missing actions are zero). Returns a DataFrame of x and Fx..Mz.
+    """
+    x = np.asarray(x, dtype=float)
+    table = pd.DataFrame({'x': x})
+    for action in engine.LOAD_DEFAULTS:
+        table[action] = np.broadcast_to(np.asarray(actions.get(action, 0.0), dtype=float), x.shape)
+    return table
+
+def station_checks(design, actions, design_engine=None):
+    """
+    Stresses and clause checks at every station of an action diagram.
+    Returns (profile DataFrame with one row per station, governing station row).
+    """
+    design = {**engine.DESIGN_DEFAULTS, **design}
+    design_engine = design_engine or engine.DesignEngine()
+    cases = actions.assign(case=actions['x'])
+    profile = load_cases.case_stresses(design_engine.section(design),design_engine.unit_stresses(design),design,cases)
+    profile = profile.rename(columns={'case': 'x'})
+
+    #K_c does not vary along a prismatic girder with uniform transverse stiffener spacing
+    checks = engine.clause_checks(design,profile.iloc[0])
+    profile['K_c'] = checks['K_c']
+    profile['flange_yield_pass'] = profile['util_flange_yield'] <= 1.0
+    governing = profile.iloc[int(profile['util_flange_yield'].to_numpy().argmax())]
+    return profile, governing
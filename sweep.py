@@ -0,0 +1,121 @@
+"""
+Parallel parametric sweeps and a random-search optimiser over the stiffener geometry.
+
+Designs are grouped by section geometry so each section is meshed and analysed
+once, however many a_panel values or load sets share it. Groups run on a
+process pool (one worker per core by default) and results are streamed back as
+each group finishes, while a Pareto front of steel mass against utilisation is
+kept up to date.
+"""
+import itertools
+import random
+import warnings
+
+import numpy as np
+
+import analytic
+import engine
+
+rho_steel = 7850 #Density of steel (kg/m^3)
+
+def design_grid(**ranges):
+    """
+    Cartesian product of design inputs, e.g.
+    design_grid(d_stif=[0.1, 0.15], t_stif=[0.01, 0.012], n_stif=[2, 3], a_panel=[1.0, 2.0])
+    Returns a list of design records (missing inputs take engine.DESIGN_DEFAULTS).
+    """
+    names = list(ranges)
+    return [dict(zip(names, values)) for values in itertools.product(*ranges.values())]
+
+def random_designs(space, n, seed=0):
+    """
+    Random search over a design space of name: list of candidate values.
+    Returns n design records drawn with a fixed seed.
+    """
+    rng = random.Random(seed)
+    return [{name: rng.choice(list(values)) for name, values in space.items()} for _ in range(n)]
+
+def steel_mass(result):
+    """Steel mass per metre of girder (kg/m) from a result record"""
+    return result['area'] * rho_steel
+
+class ParetoFront:
+    """
+    Non-dominated set of designs minimising steel mass and utilisation.
+    objective: result record key used as the utilisation
+    """
+    def __init__(self, objective='util_flange_yield'):
+        self.objective = objective
+        self.points = []
+
+    def add(self, design, result):
+        """Add a design, returning True if it is on the front"""
+        mass, util = steel_mass(result), result[self.objective]
+        for point_mass, point_util, _, _ in self.points:
+            if point_mass <= mass and point_util <= util:
+                return False
+        self.points = [point for point in self.points if not (mass <= point[0] and util <= point[1])]
+        self.points.append((mass, util, design, result))
+        self.points.sort(key=lambda point: point[0])
+        return True
+
+def run_sweep(designs, loads=None, processes=None, cache=None):
+    """
+    Evaluate designs on a process pool, yielding (index, design, result) as each
+    section group finishes.
+    designs: list of design records
+    loads: one load record for every design, or a list of load records to check each design against
+    processes: number of workers (None = one per core, 1 = in this process)
+    cache: optional section_cache.SectionCache shared by the workers
+    A design that fails gives a result of {'error': message} rather than stopping the sweep.
+    """
+    load_sets = loads if isinstance(loads, list) else [loads or {}]
+    designs = [{**engine.DESIGN_DEFAULTS, **design} for design in designs for load in load_sets]
+    groups = engine.group_by_geometry((index, design, load_sets[index % len(load_sets)])
+                                      for index, design in enumerate(designs))
+
+    cache_args = (cache.root, cache.max_bytes, cache.dtype) if cache is not None else None
+    tasks = [(jobs[0][1], jobs, cache_args, np.float64, 'fe', True) for jobs in groups]
+    for group in engine.map_groups(engine._check_group, tasks, processes):
+        for index, result in group:
+            yield index, designs[index], result
+
+def optimise(designs, loads=None, processes=None, cache=None, objective='util_flange_yield', limit=1.0, callback=None):
+    """
+    Run a sweep and keep the Pareto front of steel mass against utilisation.
+    Designs with utilisation above limit, or that failed, are reported but excluded from the front.
+    callback(index, design, result, on_front) is called as each result arrives.
+    Returns the ParetoFront.
+    """
+    front = ParetoFront(objective)
+    for index, design, result in run_sweep(designs, loads, processes, cache):
+        on_front = 'error' not in result and result[objective] <= limit and front.add(design, result)
+        if callback is not None:
+            callback(index, design, result, on_front)
+    return front
+
+def screen(designs, loads=None, objective='util_flange_yield', limit=1.0, margin=0.1, sample=5, seed=0):
+    """
+    Screen designs with the analytic engine and return those worth a finite element run:
+    analytic utilisation within limit * (1 + margin), to allow for the analytic error.
+    A seeded sample of the shortlist is then checked against FE (analytic.cross_check),
+    with a warning for every key whose analytic error exceeds margin.
+    sample: number of shortlisted designs cross-checked (0 to skip the check)
+    Returns (shortlist, errors): errors is a dict of key: largest relative error
+    (analytic / FE - 1) over the sample.
+    """
+    shortlist = []
+    for design in designs:
+        result = engine.check_design(design,loads or {},method='analytic')
+        if result[objective] <= limit * (1 + margin):
+            shortlist.append(design)
+
+    errors = {}
+    if sample and shortlist:
+        rows = analytic.cross_check(shortlist,loads,sample,seed)
+        errors = {key: float(max((row[key] for row in rows), key=abs)) for key in rows[0] if key != 'design'}
+        for key, error in errors.items():
+            if abs(error) > margin:
+                warnings.warn(f"Analytic {key} differs from FE by {error:+.1%} on the cross-checked designs, "
+                              f"beyond the screening margin of {margin:.0%}")
+    return shortlist, errors
@@ -0,0 +1,45 @@
+"""
+The handcalcs and plain numeric modes of the dual_mode clause checks must give the same results.
+"""
+import numpy as np
+import pytest
+
+import forallpeople as u
+u.environment('structural')
+
+import functions as fnc
+
+SPACING_CASES = [(1.0, 1.0, 3, 3), (2.0, 1.5, 2, 4), (0.8, 2.4, 6, 2)]
+YIELD_CASES = [(4e6, 5e6, 100e6), (0.0, 0.0, 250e6), (30e6, 12e6, -80e6)]
+
+@pytest.mark.parametrize('b, d, n_stif, n_stif_web', SPACING_CASES)
+def test_longit_stif_spacing_modes_match(b, d, n_stif, n_stif_web):
+    latex, (b_flange, b_web) = fnc.longit_stif_spacing(b * u.m,d * u.m,n_stif,n_stif_web)
+    assert 'b_{flange}' in latex
+    assert fnc.longit_stif_spacing.value(b,d,n_stif,n_stif_web) == pytest.approx((b_flange.value, b_web.value))
+
+def test_longit_stif_spacing_arrays():
+    b, d, n_stif, n_stif_web = (np.array(values) for values in zip(*SPACING_CASES))
+    b_flange, b_web = fnc.longit_stif_spacing.value(b,d,n_stif,n_stif_web)
+    for i, case in enumerate(SPACING_CASES):
+        latex, (case_flange, case_web) = fnc.longit_stif_spacing(case[0] * u.m,case[1] * u.m,case[2],case[3])
+        assert (b_flange[i], b_web[i]) == pytest.approx((case_flange.value, case_web.value))
+
+@pytest.mark.parametrize('f_star_vt, f_star_v, f_star_s_fl_mid', YIELD_CASES)
+def test_flange_yield_modes_match(f_star_vt, f_star_v, f_star_s_fl_mid):
+    latex, f_star_comb = fnc.flange_yield(f_star_vt * u.Pa,f_star_v * u.Pa,f_star_s_fl_mid * u.Pa)
+    assert 'f_{star_{comb}}' in latex
+    assert fnc.flange_yield.value(f_star_vt,f_star_v,f_star_s_fl_mid) == pytest.approx(f_star_comb.value)
+
+@pytest.mark.parametrize('f_star_vt, f_star_v, f_star_s_web_mid', YIELD_CASES)
+def test_web_yield_modes_match(f_star_vt, f_star_v, f_star_s_web_mid):
+    latex, f_star_comb = fnc.web_yield(f_star_vt * u.Pa,f_star_v * u.Pa,f_star_s_web_mid * u.Pa)
+    assert 'f_{star_{comb}}' in latex
+    assert fnc.web_yield.value(f_star_vt,f_star_v,f_star_s_web_mid) == pytest.approx(f_star_comb.value)
+
+def test_flange_yield_arrays():
+    f_star_vt, f_star_v, f_star_s_fl_mid = (np.array(values) for values in zip(*YIELD_CASES))
+    f_star_comb = fnc.flange_yield.value(f_star_vt,f_star_v,f_star_s_fl_mid)
+    for i, case in enumerate(YIELD_CASES):
+        latex, expected = fnc.flange_yield(*[stress * u.Pa for stress in case])
+        assert f_star_comb[i] == pytest.approx(expected.value)
@@ -0,0 +1,40 @@
+"""
+recover_stresses must match sectionproperties' own stress recovery (CrossSection.calculate_stress).
+"""
+import numpy as np
+import pytest
+
+import section_funcs
+
+ACTIONS = {'Fy': 100e3, 'Fz': 80e3, 'Mx': 120e3, 'My': 900e3, 'Mz': 1100e3}
+COMPONENTS = section_funcs.STRESS_COMPONENTS + tuple(section_funcs.COMBINED_COMPONENTS)
+
+@pytest.fixture(scope='module', params=[(1.0, 1.0, 3, None), (2.0, 1.5, 2, 4)], ids=['n3', 'n2-web4'])
+def section(request):
+    b, d, n_stif, n_stif_web = request.param
+    return section_funcs.analyse_section(section_funcs.boxsection(b,d,0.012,0.012,0.1,0.012,n_stif,n_stif_web=n_stif_web))
+
+def _reference(section, Fy=0, Fz=0, Mx=0, My=0, Mz=0):
+    return section.calculate_stress(Vy=Fy, Vx=Fz, Mxx=Mz, Myy=My, Mzz=Mx).get_stress()[0]
+
+def _assert_close(recovered, reference):
+    scale = max(np.abs(reference).max(), 1.0)
+    np.testing.assert_allclose(recovered, reference, rtol=0, atol=1e-9 * scale)
+
+def test_recover_stresses_matches_calculate_stress(section):
+    reference = _reference(section, **ACTIONS)
+    recovered = section_funcs.recover_stresses(section, **ACTIONS, components=COMPONENTS)
+    for component in COMPONENTS:
+        _assert_close(recovered[component], reference[component])
+
+@pytest.mark.parametrize('action', section_funcs.UNIT_ACTIONS)
+def test_recover_stresses_single_action(section, action):
+    #Fields of the zero actions are skipped, and must still match calculate_stress (zero)
+    reference = _reference(section, **{action: ACTIONS[action]})
+    recovered = section_funcs.recover_stresses(section, **{action: ACTIONS[action]}, components=COMPONENTS)
+    for component in COMPONENTS:
+        _assert_close(recovered[component], reference[component])
+
+def test_recover_stresses_rejects_unknown_components(section):
+    with pytest.raises(ValueError):
+        section_funcs.recover_stresses(section, **ACTIONS, components=('sig_vm',))
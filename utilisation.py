@@ -0,0 +1,96 @@
+"""
+Utilisation map over every plate panel and longitudinal stiffener of the box.
+
+functions.stress_locations only checks the flange and web stiffener and panels
+next to the top-left corner. Here the section is split into its elements
+(each top flange and web panel between stiffener centre-lines, the bottom
+flange and every stiffener) and the yield check is run on all of them at once:
+Cl 7.3.3.1 for the flange panels and stiffeners, and Cl 7.4.2 (full shear) for
+the web panels and stiffeners. The stresses in each element region are reduced
+in a single node_index aggregate call over the unit-load superposed fields.
+"""
+import numpy as np
+import pandas as pd
+
+import engine
+import functions as fnc
+import node_index
+import section_funcs
+
+#Result fields of each element
+ELEMENT_RESULTS = ('f_star_s', 'f_star_v', 'f_star_vt', 'f_star_comb', 'util')
+
+def section_elements(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web=None):
+    """
+    Panels and stiffeners of the box as a DataFrame with one row per element:
+    element name, kind, position ('outer' for panels next to a corner of the box,
+    'inner' otherwise, '' for stiffeners) and the region x0, y0, x1, y1.
+    """
+    n_stif_web = section_funcs.web_stiffeners(n_stif,n_stif_web)
+    x_edges = np.concatenate(([0], section_funcs.stiffener_centres(b,t_stif,n_stif), [b]))
+    y_edges = np.concatenate(([t_f], section_funcs.stiffener_centres(d,t_stif,n_stif_web), [d-t_f]))[::-1] #from the top
+    rows = []
+
+    def panels(kind, edges, region):
+        for i, ends in enumerate(zip(edges[:-1], edges[1:])):
+            position = 'outer' if i in (0, len(edges) - 2) else 'inner'
+            rows.append((f'{kind} panel {i+1}', f'{kind} panel', position) + region(min(ends), max(ends)))
+
+    panels('top flange', x_edges, lambda lo, hi: (lo, d-t_f, hi, d))
+    panels('left web', y_edges, lambda lo, hi: (0, lo, t_w, hi))
+    panels('right web', y_edges, lambda lo, hi: (b-t_w, lo, b, hi))
+    rows.append(('bottom flange', 'bottom flange', 'outer', 0, 0, b, t_f))
+
+    #box_plates lists the four plates, the top stiffeners and then the left and right web stiffener pairs
+    stiffeners = section_funcs.box_plates(b,d,t_w,t_f,d_stif,t_stif,n_stif,n_stif_web)[4:]
+    names = [f'top stiffener {i+1}' for i in range(n_stif)]
+    names += [f'{side} web stiffener {i+1}' for i in range(n_stif_web) for side in ('left', 'right')]
+    kinds = ['top stiffener'] * n_stif + ['web stiffener'] * (2 * n_stif_web)
+    rows += [(name, kind, '') + tuple(rect) for name, kind, rect in zip(names, kinds, stiffeners)]
+    return pd.DataFrame(rows, columns=['element', 'kind', 'position', 'x0', 'y0', 'x1', 'y1'])
+
+def element_utilisation(section,design,loads):
+    """
+    Yield utilisation of every element of a design's section, by Cl 7.4.2 for
+    web elements and Cl 7.3.3.1 for the others.
+    section: SectionData as per engine.build_section
+    Each element uses the greatest bending, shear and torsion stresses in its own region.
+    Returns the section_elements DataFrame with the ELEMENT_RESULTS columns added.
+    """
+    design = {**engine.DESIGN_DEFAULTS, **design}
+    loads = {**engine.LOAD_DEFAULTS, **loads}
+    elements = section_elements(*[design[key] for key in ('b', 'd', 't_w', 't_f', 'd_stif', 't_stif', 'n_stif', 'n_stif_web')])
+
+    #Regions as boxes for node_index, widened slightly so nodes on the element edges are included
+    tol = 1e-9 * max(design['b'], design['d'])
+    x0, y0, x1, y1 = elements[['x0', 'y0', 'x1', 'y1']].to_numpy().T
+    boxes = list(zip((x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 2 + tol, (y1 - y0) / 2 + tol, ['max'] * len(elements)))
+
+    actions = [loads[action] for action in section_funcs.UNIT_ACTIONS]
+    stresses = section_funcs.superpose_stresses(section.unit,actions)
+    fields = np.abs(np.concatenate([stresses[name] for name in section_funcs.CHECK_COMPONENTS]))
+    f_star_s, f_star_v, f_star_vt = node_index.section_index(section).aggregate(fields,boxes)
+
+    elements['f_star_s'] = f_star_s
+    elements['f_star_v'] = f_star_v
+    elements['f_star_vt'] = f_star_vt
+    web = elements['kind'].str.contains('web').to_numpy()
+    elements['f_star_comb'] = np.where(web, fnc.web_yield.value(f_star_vt,f_star_v,f_star_s),
+                                       fnc.flange_yield.value(f_star_vt,f_star_v,f_star_s))
+    elements['util'] = elements['f_star_comb'] / (design['phi'] * design['f_y'])
+    return elements
+
+def governing(elements, position=None):
+    """Row of the most utilised element, optionally only among panels at position 'outer' or 'inner'"""
+    if position is not None:
+        elements = elements[elements['position'] == position]
+    return elements.loc[elements['util'].idxmax()]
+
+def utilisation_map(design, loads=None, design_engine=None):
+    """
+    Utilisation of every panel and stiffener of a design.
+    Returns (element DataFrame as per element_utilisation, governing element row).
+    """
+    design_engine = design_engine or engine.DesignEngine()
+    elements = element_utilisation(design_engine.section(design),design,loads or {})
+    return elements, governing(elements)
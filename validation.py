@@ -1,10 +1,28 @@
+import io
+
 import streamlit as st
-from streamlit_drawable_canvas import st_canvas
 
-import pandas as pd
-import forallpeople as u
-u.environment('structural')
-from PIL import Image
+#The drawing canvas component and Pillow are only imported when used
+
+#Uploaded images are kept as PNG thumbnails of at most this size (px) on the longest side
+THUMBNAIL_SIZE = 1200
+#Number of thumbnails kept in memory across all sessions
+MAX_THUMBNAILS = 16
+
+@st.cache(max_entries=MAX_THUMBNAILS)
+def load_image(image_file):
+    """Display images using Pillow that
+    have been added via the streamlit file_uploader
+    using the input_description function.
+    Returns the image downscaled to THUMBNAIL_SIZE as PNG bytes"""
+    from PIL import Image
+    img = Image.open(image_file)
+    img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    if img.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+        img = img.convert('RGB') #e.g. CMYK jpegs, which PNG cannot store
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
 
 def input_description(label):
     """Create Menu for user input includes
@@ -14,16 +32,7 @@ def input_description(label):
     """
     input_methods = ["Write","Draw","Upload image"]
     input_options = []
-    #Load Images for input_description function
-    
-    @st.cache
-    def load_image(image_file):
-        """Display images using Pillow that 
-        have been added via the streamlit file_uploader
-        using the input_description function"""
-        img = Image.open(image_file)
-        return img
-        
+
     with st.beta_expander(label):
         input_methods_cols = st.beta_columns(3)
         for ind,inputs in enumerate(input_methods):
@@ -32,6 +41,7 @@ def input_description(label):
             st.text_area("Write a description:",key="write_area")
         if input_options[1]:
             #Provide drawing canvas
+            from streamlit_drawable_canvas import st_canvas
             draw_cols = st.beta_columns(2)
             stroke_width = draw_cols[0].number_input("Stroke width: ", 1, 6, 3)
             stroke_color = draw_cols[1].color_picker("Stroke color: ")
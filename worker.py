@@ -0,0 +1,118 @@
+"""
+Background evaluation of designs for the interactive app.
+
+Each session submits its current inputs as a job to a shared thread pool and
+a new submission cancels the session's previous job, so fast slider moves do
+not queue up stale runs. A job first gives the closed-form answer of the
+analytic engine (in milliseconds) and then the finite element result. The
+finite element stages run on the shared stage_graph.CalcGraph, so the page
+reads them from its memo once the job is done, and jobs are cancelled between
+stages (a stage already running is finished and kept in the memo).
+
+The page waits on the job in short steps and updates a placeholder between
+them, which lets Streamlit stop the run as soon as an input changes.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import engine
+import profiling
+import stage_graph
+
+#Results of a job, from the quickest to the final one
+RESULT_STAGES = ('analytic', 'fe')
+
+#Stage graph stages of the finite element result, checked for cancellation in between
+FE_STAGES = ('unit_stresses', 'critical_stresses', 'clause_checks')
+
+class Job:
+    """
+    Evaluation of one set of design and load params.
+    results: dict of RESULT_STAGES name: result record, filled in as each finishes
+    error: exception raised by the job, if any
+    profiler: profiling.Profiler of the stages the job ran, on its own thread
+    (see profiling.merge)
+    """
+    def __init__(self, params):
+        self.params = params
+        self.results = {}
+        self.error = None
+        self.profiler = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    def cancel(self):
+        """Stop the job before its next stage"""
+        self.cancelled.set()
+
+    def wait(self, timeout=None):
+        """Wait up to timeout seconds for the job to finish, returning True if it has"""
+        return self.finished.wait(timeout)
+
+    def latest(self):
+        """(stage name, result record) of the most refined result so far, or (None, None)"""
+        for stage in reversed(RESULT_STAGES):
+            if stage in self.results:
+                return stage, self.results[stage]
+        return None, None
+
+class Worker:
+    """
+    Pool of background threads evaluating the jobs of every session.
+    graph: stage_graph.CalcGraph shared with the page (a new design_graph if None)
+    max_workers: number of jobs run at once
+    """
+    def __init__(self, graph=None, max_workers=4):
+        self.graph = graph or stage_graph.design_graph()
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='box-girder')
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, session, params):
+        """
+        Start evaluating params for a session, cancelling its previous job.
+        A running job for the same params is returned instead of starting another.
+        """
+        with self.lock:
+            job = self.jobs.get(session)
+            if job is not None and job.params == params:
+                return job
+            if job is not None:
+                job.cancel()
+            job = self.jobs[session] = Job(params)
+        self.executor.submit(self._run, session, job)
+        return job
+
+    def cancel(self, session):
+        """Cancel the running job of a session, if any"""
+        with self.lock:
+            job = self.jobs.pop(session, None)
+        if job is not None:
+            job.cancel()
+
+    def _run(self, session, job):
+        try:
+            #Spans are recorded per job, as the page's profiler is not active on this thread
+            with profiling.record() as job.profiler:
+                if not job.cancelled.is_set():
+                    job.results['analytic'] = engine.check_design(job.params,job.params,method='analytic')
+                for stage in FE_STAGES:
+                    if job.cancelled.is_set():
+                        return
+                    self.graph.get(stage, job.params)
+                job.results['fe'] = stage_graph.evaluate(self.graph,job.params,job.params)
+        except Exception as error:
+            job.error = error
+        finally:
+            job.finished.set()
+            with self.lock:
+                if self.jobs.get(session) is job:
+                    del self.jobs[session]
+
+    def shutdown(self):
+        """Cancel every job and stop the threads"""
+        with self.lock:
+            for job in self.jobs.values():
+                job.cancel()
+            self.jobs.clear()
+        self.executor.shutdown(wait=False)